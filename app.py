@@ -9,15 +9,28 @@ Usage :
 """
 
 import argparse
+import gzip
+import json
 import math
 import sys
+import threading
 import time
 import unicodedata
+from collections import OrderedDict
 from pathlib import Path
 
 import gender_guesser.detector as gender_detector
+import numpy as np
 import pandas as pd
-from flask import Flask, jsonify, render_template, request, send_from_directory
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    render_template,
+    request,
+    send_from_directory,
+    stream_with_context,
+)
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -60,6 +73,12 @@ from pipeline.load import load_csv
 from pipeline.clean import apply_normalization
 from pipeline.sites import create_sites_table, merge_site_ids
 from pipeline.geocode import geocode_sites
+from pipeline.result_cache import ResultCache, request_key
+
+try:
+    import brotli  # optionnel : compression plus forte que gzip
+except ImportError:
+    brotli = None
 
 # ── Données globales (chargées au démarrage) ──────────────────────────
 _data = {
@@ -67,8 +86,43 @@ _data = {
     "df_sites": None,
     "df_orthos": None,
     "cities": [],       # [{"name": "PARIS", "count": 1098, "depts": ["75001", ...]}, ...]
+    "matrices": OrderedDict(),  # (mode, symétrique, zone) → DurationMatrix (LRU)
+    "last_routes": {},          # même clé → dernier ordre de visite (site_id) : départ à chaud
+    "results": ResultCache(),   # réponses de /api/generate (TTL + LRU)
+    "visited": None,            # (horodatage, {site_id}) : instantané des visites
     "ready": False,
 }
+MATRIX_ZONES_MAX = 8    # zones dont la matrice reste en mémoire
+MATRIX_SITES_MAX = 600  # sites conservés par zone avant élagage (600² × 4 o ≈ 1.4 Mo)
+_zones_lock = threading.Lock()  # LRU des zones partagée entre jobs concurrents
+VISITED_TTL_S = 60      # instantané des visites relu au plus toutes les 60 s
+
+# Valeurs par défaut du body de /api/generate (ignorées dans la clé de cache)
+GENERATE_DEFAULTS = {
+    "closed_loop": False,
+    "tsp_limit": 30,
+    "tsp_engine": "ortools",
+    "transport_mode": "driving",
+    "symmetric": False,
+    "days": 1,
+    "service_min": 10,
+    "service_min_per_ortho": 5,
+    "start_time": "08:30",
+    "prize": False,
+    "compact": False,
+}
+# Types des champs numériques / booléens, convertis comme dans generate_route
+GENERATE_TYPES = {
+    "closed_loop": bool,
+    "tsp_limit": int,
+    "symmetric": bool,
+    "days": int,
+    "day_hours": float,
+    "service_min": float,
+    "service_min_per_ortho": float,
+    "prize": bool,
+    "compact": bool,
+}
 
 
 # ═══════════════════════════════════════════════════════════════════════
@@ -95,6 +149,30 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return R * c
 
 
+def _no_progress(stage: str, message: str = "", percent: int | None = None) -> None:
+    """Callback de progression par défaut (appel synchrone)."""
+
+
+def parse_hhmm(value: str) -> int:
+    """« HH:MM » → secondes depuis minuit (ValueError si invalide)."""
+    hours, _, minutes = str(value).strip().partition(":")
+    hours, minutes = int(hours), int(minutes or 0)
+    seconds = hours * 3600 + minutes * 60
+    if hours < 0 or not 0 <= minutes < 60 or seconds > 24 * 3600:
+        raise ValueError(f"heure invalide : {value!r}")
+    return seconds
+
+
+def parse_window(value) -> tuple[int, int]:
+    """["HH:MM", "HH:MM"] → (ouverture, fermeture) en secondes (ValueError si invalide)."""
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"créneau attendu [début, fin] : {value!r}")
+    start, end = parse_hhmm(value[0]), parse_hhmm(value[1])
+    if start > end:
+        raise ValueError(f"début après la fin : {value!r}")
+    return start, end
+
+
 # ═══════════════════════════════════════════════════════════════════════
 #  Initialisation des données
 # ═══════════════════════════════════════════════════════════════════════
@@ -201,6 +279,40 @@ def _build_city_list(df_sites) -> list[dict]:
 
 app = Flask(__name__, template_folder=str(ROOT / "templates"))
 
+# ── Compression des réponses (brotli si installé, sinon gzip) ─────────
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_MIMETYPES = {"application/json", "text/html", "text/css", "application/javascript"}
+
+
+@app.after_request
+def compress_response(response):
+    """Compresse JSON/HTML selon Accept-Encoding (flux SSE et fichiers exclus)."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or not 200 <= response.status_code < 300
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    accept = request.headers.get("Accept-Encoding", "")
+    if brotli is not None and "br" in accept:
+        response.set_data(brotli.compress(data, quality=5))
+        response.headers["Content-Encoding"] = "br"
+    elif "gzip" in accept:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        return response
+    response.vary.add("Accept-Encoding")
+    return response
+
+
 # ── Initialiser les données au démarrage (important pour Gunicorn) ───
 # Quand l'app est lancée avec gunicorn, le bloc "if __name__ == '__main__'"
 # n'est pas exécuté, donc on charge les données ici pour garantir qu'elles
@@ -298,30 +410,95 @@ def api_geocode():
 
 @app.route("/api/generate", methods=["POST"])
 def api_generate():
+    """
+    Calcul synchrone (compatibilité) — l'interface passe par /api/jobs.
+    Body JSON : voir generate_route.
+    """
+    payload, status = generate_route(request.get_json(force=True))
+    return jsonify(payload), status
+
+
+def generate_route(body: dict, progress=None) -> tuple[dict, int]:
     """
     Génère le shortest path pour une ville ou un code postal.
+    Retourne (payload JSON, statut HTTP). progress(stage, message, percent)
+    est appelé à chaque étape (jobs asynchrones : peut lever JobCancelled).
     Body JSON : {
         "city": "PARIS",
         "dept": "75015",
         "closed_loop": false,
         "tsp_limit": 30,
+        "tsp_engine": "ortools",     # ou "numpy" (aperçu rapide)
+        "symmetric": false,          # matrice symétrique (mode foot)
         "start_address": "15 Avenue des Champs-Élysées, Paris",  # NOUVEAU
         "start_lat": 48.8698,                                      # NOUVEAU (pré-géocodé)
         "start_lon": 2.3078,                                       # NOUVEAU
-        "radius_km": 5                                             # NOUVEAU (rayon en km)
+        "radius_km": 5,                                            # NOUVEAU (rayon en km)
+        "days": 1,                   # > 1 : une tournée par jour (VRP)
+        "day_hours": 7,              # budget d'une journée (trajets + visites)
+        "service_min": 10,           # temps de visite fixe par site…
+        "service_min_per_ortho": 5,  # … plus ce temps par orthophoniste
+        "start_time": "08:30",       # heure de départ (créneaux horaires)
+        "default_window": ["09:00", "19:00"],              # horaires par défaut des cabinets
+        "time_windows": {"48.84512,2.29874": ["14:00", "18:00"]},  # par site_id
+        "prize": false,              # orienteering : max d'orthophonistes dans day_hours
+        "compact": false             # carte en GeoJSON + polyligne encodée (rendu client)
     }
     """
     if not _data["ready"]:
-        return jsonify({"error": "Données pas encore chargées"}), 503
+        return {"error": "Données pas encore chargées"}, 503
+
+    progress = progress or _no_progress
+
+    # ── Cache des résultats (requête normalisée + sites visités) ─────
+    visited_ids = _visited_ids()
+    cache_key = request_key(body, visited_ids, GENERATE_DEFAULTS, GENERATE_TYPES)
+    cached = _data["results"].get(cache_key)
+    if cached is not None:
+        progress("done", "Résultat en cache", 100)
+        return dict(cached, cached=True), 200
+
+    progress("filter", "Sélection des sites…", 5)
 
-    body = request.get_json(force=True)
     city_filter = (body.get("city") or "").strip().upper()
     dept_filter = (body.get("dept") or "").strip()
-    closed_loop = body.get("closed_loop", False)
+    closed_loop = bool(body.get("closed_loop", False))
     tsp_limit = int(body.get("tsp_limit", 30))
+    # Carte compacte (GeoJSON + polyligne encodée) au lieu du HTML Folium
+    compact = bool(body.get("compact", False))
+    # Moteur TSP : "ortools" (défaut) ou "numpy" (heuristique < 100 ms, aperçu)
+    tsp_engine = body.get("tsp_engine", "ortools")
+    if tsp_engine not in ("ortools", "numpy"):
+        tsp_engine = "ortools"
     transport_mode = body.get("transport_mode", "driving")
     if transport_mode not in ("driving", "foot"):
         transport_mode = "driving"
+    # Matrice symétrique (triangle supérieur + miroir) : pertinent en mode foot
+    symmetric = bool(body.get("symmetric", False))
+    # Planification multi-jours : une tournée par jour sous budget horaire
+    n_days = max(1, int(body.get("days", 1)))
+    day_hours = body.get("day_hours")
+    day_budget_s = int(float(day_hours if day_hours is not None else 7) * 3600)
+    service_base_s = int(float(body.get("service_min", 10)) * 60)
+    service_per_ortho_s = int(float(body.get("service_min_per_ortho", 5)) * 60)
+    # Créneaux horaires (optionnels) : arrivée calculée, cabinets fermés évités
+    time_windows = body.get("time_windows") or {}
+    default_window = body.get("default_window")
+    use_windows = bool(time_windows or default_window)
+    try:
+        day_start_s = parse_hhmm(body.get("start_time", "08:30"))
+        if default_window:
+            default_window = parse_window(default_window)
+        if not isinstance(time_windows, dict):
+            raise ValueError("time_windows attendu : {site_id: [début, fin]}")
+        time_windows = {sid: parse_window(window) for sid, window in time_windows.items()}
+    except (TypeError, ValueError) as exc:
+        return {"error": f"Créneau horaire invalide : {exc}"}, 400
+    # Orienteering : choisir les sites (max nb_orthos) tenant dans le budget
+    prize_mode = bool(body.get("prize", False))
+    if use_windows and n_days == 1 and day_hours is None and not prize_mode:
+        # Tournée unique : seule la fin de journée limite la durée
+        day_budget_s = 24 * 3600 - day_start_s
 
     # Point de départ personnalisé
     start_lat = body.get("start_lat")
@@ -339,10 +516,10 @@ def api_generate():
         mask = df_sites["city_clean"].str.upper() == city_filter
         df_sites = df_sites[mask].copy()
     else:
-        return jsonify({"error": "Veuillez spécifier une ville ou un code postal"}), 400
+        return {"error": "Veuillez spécifier une ville ou un code postal"}, 400
 
     if len(df_sites) == 0:
-        return jsonify({"error": "Aucun site trouvé pour ce filtre"}), 404
+        return {"error": "Aucun site trouvé pour ce filtre"}, 404
 
     # ── Filtrer les sites routable (géocodés) ─────────────────────────
     df_routable = df_sites[
@@ -365,12 +542,6 @@ def api_generate():
         print(f"  [route] Filtre rayon {radius_km} km : {n_before} → {len(df_routable)} sites")
 
     # ── Exclure les sites déjà visités du TSP ───────────────────────
-    from pipeline.db import get_all_visits
-    try:
-        visited_ids = {v["site_id"] for v in get_all_visits()}
-    except Exception:
-        visited_ids = set()
-
     if visited_ids:
         df_routable["_site_id_cmp"] = df_routable.apply(
             lambda r: f"{r['latitude']:.5f},{r['longitude']:.5f}", axis=1,
@@ -393,7 +564,7 @@ def api_generate():
         from pipeline.mapping import create_sites_map
         m = create_sites_map(df_sites.reset_index(drop=True))
         map_html = m._repr_html_()
-        return jsonify({
+        return {
             "map_html": map_html,
             "route": [],
             "stats": {
@@ -401,24 +572,54 @@ def api_generate():
                 "routable_sites": n_routable,
                 "message": "Pas assez de sites géocodés pour calculer un itinéraire.",
             },
-        })
+        }, 200
 
-    if n_routable > 300:
-        return jsonify({
+    from pipeline.cluster import (
+        CLUSTER_MAX_SITES,
+        CLUSTER_THRESHOLD,
+        plan_clustered,
+        prize_candidates,
+    )
+
+    if n_routable > CLUSTER_MAX_SITES:
+        return {
             "error": (
                 f"Trop de sites ({n_routable}) pour le calcul en temps réel. "
                 f"Filtrez par arrondissement/code postal."
             ),
-        }), 400
+        }, 400
+
+    if prize_mode and n_routable > CLUSTER_THRESHOLD:
+        # Grande zone : présélection des sites au meilleur gain autour du départ
+        keep = prize_candidates(
+            list(zip(df_routable["latitude"], df_routable["longitude"])),
+            df_routable["nb_orthos"],
+            max_sites=CLUSTER_THRESHOLD,
+            anchor=(start_lat, start_lon) if start_lat is not None and start_lon is not None else None,
+        )
+        df_routable = df_routable.iloc[keep].reset_index(drop=True)
+        print(f"  [route] Orienteering : {n_routable} → {len(df_routable)} sites candidats")
+
+    if (n_days > 1 or use_windows) and len(df_routable) > CLUSTER_THRESHOLD:
+        return {
+            "error": (
+                f"Planification multi-jours / par créneaux limitée à {CLUSTER_THRESHOLD} sites "
+                f"({n_routable} dans la zone)."
+            ),
+        }, 400
 
     # ── Phase 6 : Matrice OSRM ────────────────────────────────────────
     from pipeline.routing import (
-        compute_duration_matrix,
+        DurationMatrix,
         solve_tsp,
+        plan_multi_day,
+        service_times,
         build_route_solution,
+        build_multi_day_solution,
         fetch_route_geometry,
     )
-    from pipeline.mapping import create_route_map
+    from pipeline.geometry import format_report, simplify_geometry
+    from pipeline.mapping import compact_route_map, create_route_map
 
     coords = list(zip(df_routable["latitude"], df_routable["longitude"]))
 
@@ -452,30 +653,131 @@ def api_generate():
 
             print(f"  [route] Point de départ ajouté : {start_address}")
 
-    print(f"  [route] Calcul matrice OSRM pour {len(coords)} points (mode={transport_mode})…")
-    matrix = compute_duration_matrix(coords, profile=transport_mode)
-
-    # ── Phase 7 : TSP ─────────────────────────────────────────────────
     open_path = not closed_loop
-    print(f"  [route] Résolution TSP (limit={tsp_limit}s, open={open_path})…")
-
-    # Si on a un point de départ, forcer le TSP à commencer là
-    if start_point_idx is not None:
-        route_order, total_duration = solve_tsp(
-            matrix,
+    tsp_trace: list[dict] = []
+    segments = None
+    days = None
+    dropped: list[int] = []
+    initial_route = None
+
+    if len(coords) > CLUSTER_THRESHOLD and not (n_days > 1 or use_windows or prize_mode):
+        # ── Grande zone : clusters géographiques, pas de matrice NxN ───
+        print(f"  [route] {len(coords)} points → planification par clusters (mode={transport_mode})…")
+        progress("tsp", f"Planification par clusters ({len(coords)} points)…", 15)
+        t_tsp = time.time()
+        route_order, total_duration, segments = plan_clustered(
+            coords,
+            profile=transport_mode,
             open_path=open_path,
+            start_index=start_point_idx,
             time_limit=tsp_limit,
-            start_index=start_point_idx
+            engine=tsp_engine,
+            symmetric=symmetric,
         )
+        tsp_time_s = time.time() - t_tsp
+        matrix = None
     else:
-        route_order, total_duration = solve_tsp(
-            matrix,
-            open_path=open_path,
-            time_limit=tsp_limit
-        )
+        print(f"  [route] Calcul matrice OSRM pour {len(coords)} points (mode={transport_mode})…")
+        progress("matrix", f"Matrice des durées ({len(coords)} points)…", 15)
+        # Matrice de la zone conservée entre deux requêtes : seuls les sites
+        # nouveaux (point de départ, visite annulée…) coûtent des appels OSRM.
+        zone_key = (transport_mode, symmetric, dept_filter or city_filter)
+        with _zones_lock:
+            matrices = _data["matrices"]
+            dmatrix = matrices.pop(zone_key, None) or DurationMatrix(transport_mode, symmetric)
+            matrices[zone_key] = dmatrix
+            while len(matrices) > MATRIX_ZONES_MAX:
+                evicted, _ = matrices.popitem(last=False)
+                _data["last_routes"].pop(evicted, None)
+
+        # Élagage seulement sous pression mémoire, dans la section critique
+        # de matrix_for : jamais entre l'ajout et l'extraction d'une autre requête.
+        matrix = dmatrix.matrix_for(coords, max_sites=MATRIX_SITES_MAX)
+        coord_keys = [f"{lat:.5f},{lon:.5f}" for lat, lon in coords]
+
+        # Départ à chaud : dernière route de la zone, sites visités retirés
+        # (solve_tsp ignore les absents et insère les nouveaux sites)
+        initial_route = None
+        last_route = _data["last_routes"].get(zone_key)
+        if last_route and n_days == 1 and not use_windows and not prize_mode:
+            pos = {k: i for i, k in enumerate(coord_keys)}
+            initial_route = [pos[k] for k in last_route if k in pos]
+
+        # ── Phase 7 : TSP ─────────────────────────────────────────────
+        print(f"  [route] Résolution TSP (max={tsp_limit}s, open={open_path})…")
+        progress("tsp", "Optimisation de l'itinéraire…", 45)
+
+        # Si on a un point de départ, forcer le TSP à commencer là
+        # (tsp_limit = plafond : le budget effectif dépend du nombre de sites)
+        t_tsp = time.time()
+        if n_days > 1 or use_windows or prize_mode:
+            windows = None
+            if use_windows:
+                windows = np.full((len(coords), 2), np.nan)
+                for i, key in enumerate(coord_keys):
+                    window = time_windows.get(key, default_window)
+                    if window:
+                        windows[i] = window
+            days, dropped = plan_multi_day(
+                matrix,
+                n_days,
+                day_budget_s=day_budget_s,
+                service_s=service_times(
+                    df_routable["nb_orthos"], service_base_s, service_per_ortho_s,
+                ),
+                open_path=open_path,
+                start_index=start_point_idx,
+                time_limit=tsp_limit,
+                trace=tsp_trace,
+                windows=windows,
+                day_start_s=day_start_s,
+                prizes=df_routable["nb_orthos"] if prize_mode else None,
+            )
+            route_order = [i for d in days for i in d["route"]]
+            total_duration = float(sum(d["travel_s"] for d in days))
+            if not route_order:
+                # Créneaux incompatibles, budget trop court ou pas de solution
+                return {
+                    "error": (
+                        "Aucun site ne peut être planifié avec ces contraintes "
+                        "(créneaux horaires, durée de journée)."
+                    ),
+                    "unplanned": [
+                        {
+                            "site_id": f"{coords[i][0]:.5f},{coords[i][1]:.5f}",
+                            "label": str(df_routable.iloc[i].get("geocoded_label", "")),
+                        }
+                        for i in dropped
+                    ],
+                }, 422
+        elif start_point_idx is not None:
+            route_order, total_duration = solve_tsp(
+                matrix,
+                open_path=open_path,
+                time_limit=tsp_limit,
+                start_index=start_point_idx,
+                trace=tsp_trace,
+                engine=tsp_engine,
+                initial_route=initial_route,
+            )
+        else:
+            route_order, total_duration = solve_tsp(
+                matrix,
+                open_path=open_path,
+                time_limit=tsp_limit,
+                trace=tsp_trace,
+                engine=tsp_engine,
+                initial_route=initial_route,
+            )
+        tsp_time_s = time.time() - t_tsp
+        if days is None:
+            _data["last_routes"][zone_key] = [coord_keys[i] for i in route_order]
 
     # ── Build solution DataFrame ──────────────────────────────────────
-    df_route = build_route_solution(df_routable, route_order, matrix)
+    if days is not None:
+        df_route = build_multi_day_solution(df_routable, days)
+    else:
+        df_route = build_route_solution(df_routable, route_order, matrix, segments=segments)
 
     # ── Enrichir avec les infos des orthophonistes ────────────────────
     df_orthos = _data["df_orthos"]
@@ -500,19 +802,40 @@ def api_generate():
 
     # ── Phase 8 : Géométrie + carte ───────────────────────────────────
     route_geom = None
+    geometry_report = None
     if len(route_order) <= 300:
         print(f"  [route] Récupération géométrie OSRM (mode={transport_mode})…")
-        route_geom = fetch_route_geometry(coords, route_order, profile=transport_mode)
-
-    # Enrichir df_routable avec les noms avant de créer la carte
-    df_routable_enriched = df_routable.copy()
-    df_routable_enriched["orthos_list"] = df_routable_enriched["site_id"].apply(
-        lambda sid: orthos_by_site.get(sid, [])
-    )
+        progress("geometry", "Tracé routier…", 75)
+        if days is not None:
+            # Un tracé par jour : pas de trait entre la fin d'une journée et la suivante
+            route_geom = []
+            for d in days:
+                day_order = ([start_point_idx] if start_point_idx is not None else []) + d["route"]
+                if len(day_order) > 1:
+                    route_geom += fetch_route_geometry(coords, day_order, profile=transport_mode)
+        else:
+            route_geom = fetch_route_geometry(coords, route_order, profile=transport_mode)
+        route_geom, geometry_report = simplify_geometry(route_geom)
+        print(f"  [route] Simplification : {format_report(geometry_report)}")
+
+    progress("map", "Génération de la carte…", 90)
+
+    map_html = None
+    map_data = None
+    if compact:
+        # GeoJSON + polylignes encodées : la carte est dessinée côté client
+        map_data = compact_route_map(df_routable, route_order, route_geom,
+                                     df_visited=df_visited_on_map)
+    else:
+        # Enrichir df_routable avec les noms avant de créer la carte
+        df_routable_enriched = df_routable.copy()
+        df_routable_enriched["orthos_list"] = df_routable_enriched["site_id"].apply(
+            lambda sid: orthos_by_site.get(sid, [])
+        )
 
-    m = create_route_map(df_routable_enriched, route_order, route_geom,
-                         df_visited=df_visited_on_map)
-    map_html = m._repr_html_()
+        m = create_route_map(df_routable_enriched, route_order, route_geom,
+                             df_visited=df_visited_on_map)
+        map_html = m._repr_html_()
 
     # ── Construire la réponse ─────────────────────────────────────────
     route_list = []
@@ -522,12 +845,14 @@ def api_generate():
         lon = float(r.get("longitude", 0))
         route_list.append({
             "order": int(r["visit_order"]),
+            "day": int(r["day"]) if "day" in r else 1,
             "site_id": f"{lat:.5f},{lon:.5f}",
             "label": str(r.get("geocoded_label", "")),
             "orthos": int(r.get("nb_orthos", 0)),
             "orthos_list": orthos_by_site.get(site_id, []),
             "segment_min": float(r.get("segment_min", 0)),
             "cumul_min": float(r.get("cumul_min", 0)),
+            "arrival": str(r["arrival"]) if "arrival" in r else None,
             "lat": lat,
             "lon": lon,
         })
@@ -535,8 +860,23 @@ def api_generate():
     total_min = total_duration / 60
     total_h = total_duration / 3600
 
-    return jsonify({
+    days_stats = None
+    if days is not None:
+        days_stats = [
+            {
+                "day": k + 1,
+                "sites": len(d["route"]),
+                "travel_min": round(d["travel_s"] / 60, 1),
+                "service_min": round(d["service_s"] / 60, 1),
+                "duration_h": round(d["duration_s"] / 3600, 2),
+                "orthos": d["prize"] if prize_mode else None,
+            }
+            for k, d in enumerate(days)
+        ]
+
+    payload = {
         "map_html": map_html,
+        "map": map_data,
         "route": route_list,
         "stats": {
             "total_sites": len(df_sites),
@@ -547,14 +887,132 @@ def api_generate():
             "avg_segment_min": round(total_min / max(len(route_order) - 1, 1), 1),
             "closed_loop": closed_loop,
             "transport_mode": transport_mode,
+            "tsp_time_s": round(tsp_time_s, 2),
+            "tsp_engine": tsp_engine,
+            "clustered": segments is not None,
+            "warm_start": initial_route is not None,
+            "days": days_stats,
+            "unplanned_sites": len(dropped),
+            "prize_mode": prize_mode,
+            "geometry": geometry_report,
         },
-    })
+        "tsp_trace": tsp_trace,
+    }
+    _data["results"].put(cache_key, payload)
+    return dict(payload, cached=False), 200
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  API Jobs (calcul asynchrone + progression SSE)
+# ═══════════════════════════════════════════════════════════════════════
+
+@app.route("/api/jobs", methods=["POST"])
+def api_jobs_submit():
+    """Soumet un calcul d'itinéraire (même body que /api/generate) → 202 + job_id."""
+    if not _data["ready"]:
+        return jsonify({"error": "Données pas encore chargées"}), 503
+    from pipeline.jobs import get_job_manager
+
+    job = get_job_manager().submit(generate_route, request.get_json(force=True))
+    return jsonify(job.snapshot()), 202
+
+
+def _get_job_or_404(job_id: str):
+    from pipeline.jobs import get_job_manager
+
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return None, (jsonify({"error": "Job introuvable ou expiré"}), 404)
+    return job, None
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def api_jobs_status(job_id: str):
+    """Statut et progression d'un job."""
+    job, err = _get_job_or_404(job_id)
+    if err:
+        return err
+    return jsonify(job.snapshot())
+
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def api_jobs_events(job_id: str):
+    """Flux SSE de la progression ; se ferme quand le job est terminé."""
+    job, err = _get_job_or_404(job_id)
+    if err:
+        return err
+
+    def stream():
+        seen = 0
+        while True:
+            events = job.wait_events(seen, timeout=15)
+            if not events:
+                if job.finished:
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+            seen += len(events)
+            if job.finished and seen >= len(job.events):
+                break
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+def api_jobs_result(job_id: str):
+    """Résultat d'un job terminé (même réponse que /api/generate) ; 409 sinon."""
+    job, err = _get_job_or_404(job_id)
+    if err:
+        return err
+    if job.status == "done" or (job.status == "error" and job.result is not None):
+        return jsonify(job.result), job.http_status
+    if job.status == "error":
+        return jsonify({"error": job.error}), job.http_status
+    return jsonify(job.snapshot()), 409
+
+
+@app.route("/api/jobs/<job_id>", methods=["DELETE"])
+def api_jobs_cancel(job_id: str):
+    """Annule un job (immédiat s'il est en file, à l'étape suivante sinon)."""
+    from pipeline.jobs import get_job_manager
+
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job introuvable ou expiré"}), 404
+    return jsonify(job.snapshot())
 
 
 # ═══════════════════════════════════════════════════════════════════════
 #  API Visites (MongoDB Atlas)
 # ═══════════════════════════════════════════════════════════════════════
 
+def _visited_ids() -> set[str]:
+    """site_id visités, relus dans MongoDB au plus toutes les VISITED_TTL_S."""
+    snapshot = _data["visited"]
+    if snapshot is not None and time.time() - snapshot[0] < VISITED_TTL_S:
+        return snapshot[1]
+
+    from pipeline.db import get_all_visits
+    try:
+        visited = {v["site_id"] for v in get_all_visits()}
+    except Exception:
+        return set()
+    _data["visited"] = (time.time(), visited)
+    return visited
+
+
+def _invalidate_visits() -> None:
+    """Visites modifiées : instantané et résultats en cache deviennent faux."""
+    _data["visited"] = None
+    _data["results"].clear()
+
+
 @app.route("/api/visits", methods=["GET"])
 def api_visits_list():
     """Retourne tous les sites visités."""
@@ -582,6 +1040,7 @@ def api_visits_create():
 
     try:
         doc = mark_visited(site_id, label, float(lat or 0), float(lon or 0))
+        _invalidate_visits()
         return jsonify(doc), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -594,6 +1053,7 @@ def api_visits_delete(site_id: str):
     try:
         deleted = unmark_visited(site_id)
         if deleted:
+            _invalidate_visits()
             return jsonify({"ok": True})
         return jsonify({"error": "Visite non trouvée"}), 404
     except Exception as e:
@@ -0,0 +1,262 @@
+"""
+Planification hiérarchique « cluster-first, route-second » (grandes zones).
+
+Au-delà de CLUSTER_THRESHOLD sites, la matrice NxN complète devient trop
+coûteuse (OSRM N², solveur). On procède en trois temps :
+
+  1. clustering géographique (k-means NumPy, ~CLUSTER_SIZE sites/cluster)
+  2. ordre des clusters : TSP sur la matrice K×K de leurs représentants
+     (site le plus proche du centroïde)
+  3. TSP de chaque cluster en parallèle sur sa propre matrice, puis
+     raccord des tournées : le sens de parcours de chaque cluster est
+     choisi par programmation dynamique sur les durées entre extrémités
+
+Nombre de paires OSRM : ≈ N²/K (intra-cluster) + K² (représentants)
++ 4K² (matrice complète entre les ≤ 2K extrémités de tournées) au lieu
+de N², soit ≈ N²/K + 5K².
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .routing import DEFAULT_PROFILE, compute_duration_matrix, solve_tsp
+
+CLUSTER_SIZE = 60          # sites visés par cluster
+CLUSTER_THRESHOLD = 300    # au-delà : planification hiérarchique
+CLUSTER_MAX_SITES = 5000   # garde-fou pour /api/generate
+CLUSTER_WORKERS = 4        # TSP de clusters résolus en parallèle
+KMEANS_ITERS = 25
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Clustering géographique
+# ═══════════════════════════════════════════════════════════════════════
+
+def _project_km(coords: list[tuple[float, float]]) -> np.ndarray:
+    """(lat, lon) → plan local en km (équirectangulaire, suffisant à l'échelle d'une ville)."""
+    pts = np.asarray(coords, dtype=float)
+    lat0 = math.radians(pts[:, 0].mean())
+    return np.column_stack((pts[:, 0] * 111.32, pts[:, 1] * 111.32 * math.cos(lat0)))
+
+
+def kmeans(points: np.ndarray, k: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """k-means (initialisation k-means++) ; retourne le label de chaque point."""
+    n = len(points)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+
+    centers = [points[rng.integers(n)]]
+    d2 = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        probs = d2 / d2.sum() if d2.sum() > 0 else None
+        centers.append(points[rng.choice(n, p=probs)])
+        d2 = np.minimum(d2, ((points - centers[-1]) ** 2).sum(axis=1))
+    centers = np.array(centers)
+
+    labels = np.zeros(n, dtype=int)
+    for it in range(iters):
+        dist = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new_labels = dist.argmin(axis=1)
+        if it > 0 and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = points[labels == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+
+    # Renuméroter pour éliminer les clusters vides
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels
+
+
+def prize_candidates(
+    coords: list[tuple[float, float]],
+    prizes,
+    max_sites: int = CLUSTER_THRESHOLD,
+    anchor: tuple[float, float] | None = None,
+) -> np.ndarray:
+    """
+    Présélection pour le mode orienteering sur une grande zone : les
+    max_sites sites au meilleur rapport gain / distance autour d'un point
+    d'ancrage — le point de départ, sinon le centre du cluster k-means
+    (~max_sites sites) au gain total le plus élevé.
+    Retourne les indices retenus, triés.
+    """
+    n = len(coords)
+    if n <= max_sites:
+        return np.arange(n)
+    gain = np.nan_to_num(np.asarray(prizes, dtype=float))
+    pts = _project_km(list(coords) + ([anchor] if anchor is not None else []))
+
+    if anchor is not None:
+        center = pts[-1]
+        pts = pts[:-1]
+    else:
+        labels = kmeans(pts, math.ceil(n / max_sites))
+        best = np.bincount(labels, weights=gain).argmax()
+        center = pts[labels == best].mean(axis=0)
+
+    dist = np.sqrt(((pts - center) ** 2).sum(axis=1))
+    score = gain / (1.0 + dist)
+    return np.sort(np.argsort(-score, kind="stable")[:max_sites])
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Planification
+# ═══════════════════════════════════════════════════════════════════════
+
+def _path_cost(matrix: np.ndarray, path: list[int]) -> int:
+    return int(sum(int(matrix[a, b]) for a, b in zip(path, path[1:])))
+
+
+def plan_clustered(
+    coords: list[tuple[float, float]],
+    profile: str = DEFAULT_PROFILE,
+    open_path: bool = True,
+    start_index: int | None = None,
+    time_limit: float | None = 30,
+    engine: str = "ortools",
+    cluster_size: int = CLUSTER_SIZE,
+    symmetric: bool = False,
+) -> tuple[list[int], float, list[int]]:
+    """
+    Itinéraire sur un grand nombre de sites sans matrice NxN.
+
+    Mêmes conventions que solve_tsp : la route ne contient pas start_index
+    (point de départ) ; total inclut le trajet départ → premier site et,
+    en boucle fermée, le retour.
+
+    Retourne (route, total_seconds, segments) — segments[i] = durée (s)
+    du trajet vers route[i] depuis l'arrêt précédent (0 pour le premier
+    arrêt sans point de départ) — à passer à build_route_solution.
+    """
+    n = len(coords)
+    labels = kmeans(_project_km(coords), math.ceil(n / cluster_size))
+    k = int(labels.max()) + 1
+    members = [np.flatnonzero(labels == c) for c in range(k)]
+    print(f"  [cluster] {n} sites → {k} clusters (~{n // k} sites)")
+
+    # ── 1. Ordre des clusters via leurs représentants ────────────────
+    pts = _project_km(coords)
+    reps = []
+    for idx in members:
+        center = pts[idx].mean(axis=0)
+        reps.append(int(idx[((pts[idx] - center) ** 2).sum(axis=1).argmin()]))
+    start_cluster = int(labels[start_index]) if start_index is not None else None
+
+    if k == 1:
+        cluster_order = [0]
+    else:
+        rep_matrix = compute_duration_matrix(
+            [coords[r] for r in reps], profile=profile, symmetric=symmetric,
+        )
+        order, _ = solve_tsp(
+            rep_matrix, open_path=open_path, time_limit=min(time_limit or 5, 5),
+            start_index=start_cluster, engine=engine,
+        )
+        # solve_tsp exclut le dépôt réel (cluster de départ, ou 0 en boucle fermée)
+        depot = start_cluster if start_cluster is not None else (None if open_path else 0)
+        cluster_order = ([depot] if depot is not None else []) + order
+
+    # ── 2. Matrices intra-cluster (séquentiel : budget OSRM partagé) ──
+    matrices = [
+        compute_duration_matrix([coords[i] for i in idx], profile=profile, symmetric=symmetric)
+        for idx in members
+    ]
+
+    # ── 3. TSP de chaque cluster en parallèle (chemins ouverts) ──────
+    per_cluster_limit = None if time_limit is None else max(1.0, time_limit / max(1, k // CLUSTER_WORKERS))
+
+    def solve_cluster(c: int) -> list[int]:
+        idx = members[c]
+        if len(idx) == 1:
+            return [0]
+        local_start = None
+        if c == start_cluster:
+            local_start = int(np.flatnonzero(idx == start_index)[0])
+        route, _ = solve_tsp(
+            matrices[c], open_path=True, time_limit=per_cluster_limit,
+            start_index=local_start, engine=engine,
+        )
+        return ([local_start] if local_start is not None else []) + route
+
+    with ThreadPoolExecutor(max_workers=CLUSTER_WORKERS) as pool:
+        local_paths = list(pool.map(solve_cluster, range(k)))
+
+    paths = {c: [int(members[c][i]) for i in local_paths[c]] for c in range(k)}
+    internal = {
+        c: (
+            _path_cost(matrices[c], local_paths[c]),
+            _path_cost(matrices[c], local_paths[c][::-1]),
+        )
+        for c in range(k)
+    }
+
+    # ── 4. Raccord : sens de parcours par programmation dynamique ────
+    ends = sorted({p[0] for p in paths.values()} | {p[-1] for p in paths.values()})
+    pos = {site: i for i, site in enumerate(ends)}
+    conn = compute_duration_matrix([coords[i] for i in ends], profile=profile, symmetric=symmetric)
+
+    def entry_exit(c: int, o: int) -> tuple[int, int]:
+        p = paths[c]
+        return (p[0], p[-1]) if o == 0 else (p[-1], p[0])
+
+    def link(a: int, b: int) -> int:
+        return int(conn[pos[a], pos[b]])
+
+    first = cluster_order[0]
+    first_options = [0] if first == start_cluster else [0, 1]
+    best_total, best_orient = None, None
+
+    for o_first in first_options:
+        cost = {o_first: internal[first][o_first]}
+        back = [{o_first: None}]
+        for c_prev, c in zip(cluster_order, cluster_order[1:]):
+            new_cost, new_back = {}, {}
+            for o in (0, 1):
+                entry, _ = entry_exit(c, o)
+                cands = [
+                    (cost[po] + link(entry_exit(c_prev, po)[1], entry), po)
+                    for po in cost
+                ]
+                value, po = min(cands)
+                new_cost[o] = value + internal[c][o]
+                new_back[o] = po
+            cost, back = new_cost, back + [new_back]
+
+        for o_last, value in cost.items():
+            if not open_path and len(cluster_order) > 1:
+                value += link(entry_exit(cluster_order[-1], o_last)[1], entry_exit(first, o_first)[0])
+            if best_total is None or value < best_total:
+                orient = [o_last]
+                for step in range(len(cluster_order) - 1, 0, -1):
+                    orient.append(back[step][orient[-1]])
+                best_total, best_orient = value, orient[::-1]
+
+    full: list[int] = []
+    for c, o in zip(cluster_order, best_orient):
+        full.extend(paths[c] if o == 0 else paths[c][::-1])
+
+    # ── Segments (intra-cluster : matrice locale ; raccords : conn) ──
+    local_pos = {int(site): (c, i) for c in range(k) for i, site in enumerate(members[c])}
+    segments = [0]
+    for a, b in zip(full, full[1:]):
+        ca, ia = local_pos[a]
+        cb, ib = local_pos[b]
+        segments.append(int(matrices[ca][ia, ib]) if ca == cb else link(a, b))
+
+    total = float(sum(segments))
+    if not open_path and len(full) > 1:
+        ca, ia = local_pos[full[-1]]
+        cb, ib = local_pos[full[0]]
+        total += int(matrices[ca][ia, ib]) if ca == cb else link(full[-1], full[0])
+
+    if start_index is not None:
+        # Convention solve_tsp : le point de départ n'est pas un arrêt
+        full, segments = full[1:], segments[1:]
+
+    print(f"  [cluster] itinéraire raccordé : {total / 60:.0f} min")
+    return full, total, segments
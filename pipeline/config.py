@@ -4,6 +4,7 @@ Configuration globale du pipeline.
 Chemins, colonnes attendues, constantes de normalisation.
 """
 
+import os
 from pathlib import Path
 
 # ── Chemins ──────────────────────────────────────────────────────────
@@ -80,9 +81,32 @@ STREET_TYPES_LONG = [
 ]
 
 # ── Géocodage ────────────────────────────────────────────────────────
-GEOCODE_URL = "https://data.geopf.fr/geocodage/search"
+GEOCODE_URL = os.environ.get("GEOCODE_URL", "https://data.geopf.fr/geocodage/search")
+GEOCODE_CSV_URL = os.environ.get("GEOCODE_CSV_URL", GEOCODE_URL.rstrip("/") + "/csv")
 GEOCODE_SCORE_OK = 0.70
 GEOCODE_SCORE_WARN = 0.50
-GEOCODE_SLEEP = 0.08          # secondes entre requêtes
+GEOCODE_FALLBACK_SCORE = 0.30 # en dessous : adresse normalisée puis commune
+GEOCODE_BULK_MIN = 50         # sites à géocoder à partir desquels on passe par /search/csv
+GEOCODE_BULK_CHUNK = 2000     # lignes par envoi CSV
+GEOCODE_BULK_TIMEOUT = 300    # secondes par envoi
+GEOCODE_SLEEP = 0.08          # secondes entre requêtes au démarrage (1 / débit initial)
 GEOCODE_TIMEOUT = 10          # secondes
 GEOCODE_RETRIES = 3
+GEOCODE_WORKERS = int(os.environ.get("GEOCODE_WORKERS", 8))   # requêtes simultanées
+GEOCODE_RPS_MIN = 1.0         # débit adaptatif (req/s) : plancher…
+GEOCODE_RPS_MAX = float(os.environ.get("GEOCODE_RPS_MAX", 40))  # … et plafond (API : 50/s par IP)
+GEOCODE_RPS_STEP = 1.0        # hausse additive (req/s gagnées par seconde sans erreur)
+
+# ── Durées OSRM ──────────────────────────────────────────────────────
+# Secondes entières non signées : 2× plus compact que float64 et
+# directement exploitable par OR-Tools (coûts entiers).
+DURATION_DTYPE = "uint32"
+
+# ── Cache OSRM (durées par paire de sites) ───────────────────────────
+OSRM_CACHE_PATH = CACHE_DIR / "osrm_durations.sqlite"
+OSRM_CACHE_MAX_PAIRS = 2_000_000   # au-delà : éviction LRU
+OSRM_CACHE_TTL_DAYS = 30           # réseau routier : rafraîchir périodiquement
+OSRM_CACHE_MAX_LEGS = 200_000      # tracés de tronçons (polylines), éviction LRU
+
+# ── Matrices précalculées par zone (code postal) ─────────────────────
+MATRIX_DIR = OUTPUT_DIR / "matrices"
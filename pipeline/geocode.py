@@ -3,51 +3,157 @@ PHASE 4 — Géocodage des sites via l'API publique française.
 
 Utilise https://data.geopf.fr/geocodage/search (API BAN / IGN).
 Implémente :
-  - cache disque (JSON) pour éviter les requêtes redondantes
-  - throttle (sleep entre requêtes)
-  - retry avec back-off exponentiel
+  - cache disque (SQLite, cf. geocode_cache) pour éviter les requêtes
+    redondantes
+  - mode groupé : les sites absents du cache sont envoyés par lots CSV
+    à /search/csv ; seules les lignes à score faible repassent par le
+    fallback unitaire
+  - requêtes unitaires concurrentes (pool de GEOCODE_WORKERS threads) sur
+    une session HTTP keep-alive partagée
+  - débit adaptatif AIMD : hausse additive tant que l'API répond, débit
+    divisé par deux et pause sur 429 / 5xx
+  - retry avec back-off
   - stratégie de fallback (adresse → adresse complète → ville seule)
   - scoring : OK ≥ 0.7 / WARNING ≥ 0.5 / FAILED < 0.5
 """
 
-import json
+import csv
+import io
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
 
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 
 from .config import (
     CACHE_DIR,
+    GEOCODE_BULK_CHUNK,
+    GEOCODE_BULK_MIN,
+    GEOCODE_BULK_TIMEOUT,
+    GEOCODE_CSV_URL,
+    GEOCODE_FALLBACK_SCORE,
     GEOCODE_RETRIES,
+    GEOCODE_RPS_MAX,
+    GEOCODE_RPS_MIN,
+    GEOCODE_RPS_STEP,
     GEOCODE_SCORE_OK,
     GEOCODE_SCORE_WARN,
     GEOCODE_SLEEP,
     GEOCODE_TIMEOUT,
     GEOCODE_URL,
+    GEOCODE_WORKERS,
 )
+from .geocode_cache import GeocodeCache
 
 
 # ═══════════════════════════════════════════════════════════════════════
-#  Cache disque
+#  Session HTTP et débit adaptatif
 # ═══════════════════════════════════════════════════════════════════════
 
-def _load_cache(cache_path: Path) -> dict:
-    if cache_path.exists():
-        with cache_path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
+class _AdaptiveRate:
+    """
+    Cadenceur partagé entre threads, à débit adaptatif (AIMD) :
+      - success() : +step req/s par seconde de réponses saines
+      - backoff() : débit divisé par deux, toutes les requêtes suspendues
+        pendant `delay` s (Retry-After si l'API le fournit) ; les refus
+        reçus pendant cette pause (requêtes déjà parties) ne comptent
+        qu'une fois
+    """
 
-def _save_cache(cache: dict, cache_path: Path) -> None:
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = cache_path.with_suffix(".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False)
-    tmp.replace(cache_path)
+    def __init__(
+        self,
+        rate: float = 1 / GEOCODE_SLEEP,
+        min_rate: float = GEOCODE_RPS_MIN,
+        max_rate: float = GEOCODE_RPS_MAX,
+        step: float = GEOCODE_RPS_STEP,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, min_rate), self.max_rate)
+        self.step = step
+        self.backoffs = 0
+        self._next = time.monotonic()
+        self._calm_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Attend le prochain créneau d'envoi."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.step / self.rate)
+
+    def backoff(self, delay: float | None = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._calm_until:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.backoffs += 1
+            pause = delay if delay is not None else 1.0 / self.rate
+            self._next = max(self._next, now + pause)
+            self._calm_until = max(self._calm_until, self._next)
+
+
+def _retry_after(resp: requests.Response) -> float | None:
+    """Délai demandé par l'API (en-tête Retry-After en secondes), sinon None."""
+    try:
+        return min(float(resp.headers.get("Retry-After", "")), 60.0)
+    except ValueError:
+        return None
+
+
+_session: requests.Session | None = None
+_limiter: _AdaptiveRate | None = None
+_shared_lock = threading.Lock()
+
+
+def _get_session() -> tuple[requests.Session, _AdaptiveRate]:
+    """Session keep-alive et cadenceur partagés, créés à la première utilisation."""
+    global _session, _limiter
+    with _shared_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers["User-Agent"] = "ortho-pipeline/1.0"
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(GEOCODE_WORKERS, 1))
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _limiter = _AdaptiveRate()
+        return _session, _limiter
+
+
+def _request(method: str, url: str, timeout: float, **kwargs) -> requests.Response | None:
+    """
+    Requête cadencée avec retry : 429 / 5xx / erreur réseau → backoff() puis
+    nouvel essai. Retourne None si l'API reste saturée après GEOCODE_RETRIES
+    essais ; lève l'exception réseau ou HTTP (4xx) sinon.
+    """
+    session, limiter = _get_session()
+    for attempt in range(GEOCODE_RETRIES):
+        limiter.acquire()
+        try:
+            resp = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.RequestException:
+            if attempt >= GEOCODE_RETRIES - 1:
+                raise
+            limiter.backoff(2 ** attempt)
+            continue
+        if resp.status_code == 429 or resp.status_code >= 500:
+            limiter.backoff(_retry_after(resp) or 2 ** attempt)
+            continue
+        resp.raise_for_status()
+        limiter.success()
+        return resp
+    return None
 
 
 # ═══════════════════════════════════════════════════════════════════════
@@ -63,30 +169,13 @@ def _call_api(query: str, postcode: str = "") -> dict:
     if postcode:
         params["postcode"] = postcode
 
-    url = f"{GEOCODE_URL}?{urlencode(params)}"
-
-    for attempt in range(GEOCODE_RETRIES):
-        try:
-            req = Request(url, headers={"User-Agent": "ortho-pipeline/1.0"})
-            with urlopen(req, timeout=GEOCODE_TIMEOUT) as resp:
-                return json.loads(resp.read().decode("utf-8"))
-        except HTTPError as exc:
-            if exc.code == 429 or exc.code >= 500:
-                time.sleep(2 ** attempt)
-                continue
-            raise
-        except (URLError, TimeoutError, OSError):
-            if attempt >= GEOCODE_RETRIES - 1:
-                raise
-            time.sleep(2 ** attempt)
-
-    return {}
+    resp = _request("GET", GEOCODE_URL, GEOCODE_TIMEOUT, params=params)
+    return resp.json() if resp is not None else {}
 
 
-def _parse_response(data: dict) -> dict:
-    """Parse le GeoJSON et retourne un dict plat."""
-    features = data.get("features", [])
-    if not features:
+def _make_result(label: str, lat, lon, score: float) -> dict:
+    """Résultat plat (label, coordonnées, score, statut)."""
+    if lat is None or lon is None:
         return {
             "geocoded_label": "",
             "latitude": None,
@@ -95,11 +184,6 @@ def _parse_response(data: dict) -> dict:
             "status": "FAILED",
         }
 
-    feat = features[0]
-    props = feat.get("properties", {})
-    coords = feat.get("geometry", {}).get("coordinates", [None, None])
-    score = float(props.get("score", 0))
-
     if score >= GEOCODE_SCORE_OK:
         status = "OK"
     elif score >= GEOCODE_SCORE_WARN:
@@ -108,14 +192,76 @@ def _parse_response(data: dict) -> dict:
         status = "FAILED"
 
     return {
-        "geocoded_label": props.get("label", ""),
-        "latitude": coords[1],
-        "longitude": coords[0],
+        "geocoded_label": label,
+        "latitude": lat,
+        "longitude": lon,
         "score": round(score, 4),
         "status": status,
     }
 
 
+def _parse_response(data: dict) -> dict:
+    """Parse le GeoJSON et retourne un dict plat."""
+    features = data.get("features", [])
+    if not features:
+        return _make_result("", None, None, 0.0)
+
+    feat = features[0]
+    props = feat.get("properties", {})
+    coords = feat.get("geometry", {}).get("coordinates", [None, None])
+    return _make_result(props.get("label", ""), coords[1], coords[0], float(props.get("score", 0)))
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Appel API groupé (CSV)
+# ═══════════════════════════════════════════════════════════════════════
+
+_BULK_FIELDS = ("row_id", "address_line_clean", "postal_code_clean", "city_clean")
+
+
+def _call_bulk(rows: list[dict]) -> list[dict]:
+    """
+    Envoie un lot de lignes (_BULK_FIELDS) à /search/csv : requête construite
+    sur adresse + ville, filtrée par code postal (comme le niveau 1 de
+    geocode_one). Retourne les lignes du CSV de réponse, dans l'ordre.
+    """
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=_BULK_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+    resp = _request(
+        "POST", GEOCODE_CSV_URL, GEOCODE_BULK_TIMEOUT,
+        data=[
+            ("columns", "address_line_clean"),
+            ("columns", "city_clean"),
+            ("postcode", "postal_code_clean"),
+        ],
+        files={"data": ("sites.csv", buf.getvalue().encode("utf-8"), "text/csv")},
+    )
+    if resp is None:
+        raise RuntimeError("API de géocodage saturée (429/5xx)")
+    text = resp.content.decode("utf-8-sig")
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def _parse_bulk_row(row: dict) -> dict:
+    """Ligne du CSV de réponse (latitude, longitude, result_*) → dict plat."""
+    def number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    score = number(row.get("result_score")) or 0.0
+    return _make_result(
+        row.get("result_label") or "",
+        number(row.get("latitude")),
+        number(row.get("longitude")),
+        score,
+    )
+
+
 # ═══════════════════════════════════════════════════════════════════════
 #  Géocodage d'un site (stratégie multi-niveaux)
 # ═══════════════════════════════════════════════════════════════════════
@@ -137,11 +283,16 @@ def geocode_one(
         try:
             data = _call_api(address_line, postal_code)
             result = _parse_response(data)
-            if result["score"] >= 0.3:
+            if result["score"] >= GEOCODE_FALLBACK_SCORE:
                 return result
         except Exception:
             pass
 
+    return _geocode_fallback(postal_code, city, address_normalized)
+
+
+def _geocode_fallback(postal_code: str, city: str, address_normalized: str) -> dict:
+    """Niveaux 2 et 3 de geocode_one (adresse normalisée, puis commune)."""
     # ── Niveau 2 : adresse normalisée complète ───────────────────────
     if address_normalized:
         try:
@@ -160,82 +311,156 @@ def geocode_one(
         except Exception:
             pass
 
-    return {
-        "geocoded_label": "",
-        "latitude": None,
-        "longitude": None,
-        "score": 0.0,
-        "status": "FAILED",
-    }
+    return _make_result("", None, None, 0.0)
 
 
 # ═══════════════════════════════════════════════════════════════════════
 #  Géocodage de tous les sites (avec cache et progression)
 # ═══════════════════════════════════════════════════════════════════════
 
+def _geocode_bulk(
+    pending: pd.DataFrame,
+    known: dict,
+    cache: GeocodeCache,
+) -> tuple[set[str], list[tuple[pd.Series, bool]]]:
+    """
+    Géocode les sites `pending` (une ligne par address_key absente du
+    cache) par lots de GEOCODE_BULK_CHUNK via /search/csv. Les résultats
+    sont ajoutés à `known` et écrits dans le cache après chaque lot.
+    Retourne (clés géocodées, lignes restant à traiter unitairement) :
+    chaque ligne restante est accompagnée de fallback_only — True pour un
+    score sous GEOCODE_FALLBACK_SCORE (niveaux 2-3 seulement), False pour
+    un lot en échec (géocodage complet).
+    """
+    done: set[str] = set()
+    remaining: list[tuple[pd.Series, bool]] = []
+    n = len(pending)
+
+    for start in range(0, n, GEOCODE_BULK_CHUNK):
+        chunk = pending.iloc[start:start + GEOCODE_BULK_CHUNK]
+        rows = [
+            {
+                "row_id": str(k),
+                "address_line_clean": row["address_line_clean"],
+                "postal_code_clean": row["postal_code_clean"],
+                "city_clean": row["city_clean"],
+            }
+            for k, (_, row) in enumerate(chunk.iterrows())
+        ]
+        try:
+            answers = {r.get("row_id"): r for r in _call_bulk(rows)}
+        except Exception as exc:
+            print(f"    [warn] géocodage groupé : {exc} — lot géocodé ligne à ligne", file=sys.stderr)
+            remaining.extend((row, False) for _, row in chunk.iterrows())
+            continue
+
+        low = 0
+        batch: dict[str, dict] = {}
+        for k, (_, row) in enumerate(chunk.iterrows()):
+            answer = answers.get(str(k))
+            result = _parse_bulk_row(answer) if answer is not None else _make_result("", None, None, 0.0)
+            if result["score"] < GEOCODE_FALLBACK_SCORE:
+                remaining.append((row, True))
+                low += 1
+                continue
+            batch[row["address_key"]] = result
+
+        cache.store(batch)
+        known.update(batch)
+        done.update(batch)
+        print(f"    [groupé {min(start + GEOCODE_BULK_CHUNK, n)}/{n}]  score faible={low}")
+
+    return done, remaining
+
+
+def _geocode_row(row: pd.Series, fallback_only: bool = False) -> dict:
+    if fallback_only:
+        return _geocode_fallback(row["postal_code_clean"], row["city_clean"], row["address_normalized"])
+    return geocode_one(
+        row["address_line_clean"],
+        row["postal_code_clean"],
+        row["city_clean"],
+        row["address_normalized"],
+    )
+
+
 def geocode_sites(
     df_sites: pd.DataFrame,
     cache_dir: Path | str | None = None,
+    bulk: bool | None = None,
+    workers: int = GEOCODE_WORKERS,
+    export: bool = False,
 ) -> pd.DataFrame:
     """
     Géocode chaque site de df_sites.
-    Utilise un cache JSON pour éviter de re-géocoder.
+    Utilise le cache SQLite (cache_dir/geocode_cache.sqlite) pour éviter
+    de re-géocoder ; seules les adresses du DataFrame y sont lues.
+    export : réécrit geocode_cache.json si de nouvelles adresses ont été
+    géocodées (run_pipeline seulement, pas au démarrage du serveur).
+    bulk : envoi groupé CSV des sites hors cache (None → automatique à
+    partir de GEOCODE_BULK_MIN sites à géocoder).
+    workers : requêtes unitaires simultanées (débit global adaptatif).
     Ajoute les colonnes : geocoded_label, latitude, longitude, score, status.
     """
-    cache_path = Path(cache_dir or CACHE_DIR) / "geocode_cache.json"
-    cache = _load_cache(cache_path)
+    cache = GeocodeCache(cache_dir or CACHE_DIR)
+    known = cache.lookup(df_sites["address_key"])
 
-    results: list[dict] = []
     n = len(df_sites)
-    new_count = 0
-    cached_count = 0
-    errors = 0
-
-    for i, (_, row) in enumerate(df_sites.iterrows()):
-        key = row["address_key"]
-
-        if key in cache:
-            results.append(cache[key])
-            cached_count += 1
-        else:
-            try:
-                result = geocode_one(
-                    row["address_line_clean"],
-                    row["postal_code_clean"],
-                    row["city_clean"],
-                    row["address_normalized"],
-                )
-            except Exception as exc:
-                print(f"    [erreur] site {key}: {exc}", file=sys.stderr)
-                result = {
-                    "geocoded_label": "",
-                    "latitude": None,
-                    "longitude": None,
-                    "score": 0.0,
-                    "status": "FAILED",
-                }
-                errors += 1
-
-            cache[key] = result
-            results.append(result)
-            new_count += 1
-
-            if new_count % 100 == 0:
-                _save_cache(cache, cache_path)
-
-            time.sleep(GEOCODE_SLEEP)
-
-        # Progression
-        done = i + 1
-        if done % 500 == 0 or done == n:
-            print(
-                f"    [{done}/{n}]  cache={cached_count}  "
-                f"new={new_count}  erreurs={errors}",
-            )
-
-    if new_count > 0:
-        _save_cache(cache, cache_path)
+    cached_count = int(df_sites["address_key"].isin(known.keys()).sum())
+    pending = df_sites[~df_sites["address_key"].isin(known.keys())].drop_duplicates("address_key")
+
+    # ── Sites hors cache : envoi groupé ──────────────────────────────
+    # (les adresses vides passent directement par le fallback unitaire)
+    with_address = pending["address_line_clean"].astype(bool)
+    if bulk is None:
+        bulk = int(with_address.sum()) >= GEOCODE_BULK_MIN
+    todo: list[tuple[pd.Series, bool]]
+    if bulk and with_address.any():
+        print(f"    Géocodage groupé : {int(with_address.sum())} sites → {GEOCODE_CSV_URL}")
+        fresh, todo = _geocode_bulk(pending[with_address], known, cache)
+        todo += [(row, False) for _, row in pending[~with_address].iterrows()]
+    else:
+        fresh, todo = set(), [(row, False) for _, row in pending.iterrows()]
 
+    # ── Requêtes unitaires concurrentes ──────────────────────────────
+    errors = 0
+    batch: dict[str, dict] = {}
+    if todo:
+        print(f"    Géocodage unitaire : {len(todo)} sites, {workers} threads")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(_geocode_row, row, fallback_only): row["address_key"]
+                       for row, fallback_only in todo}
+            for done, future in enumerate(as_completed(futures), start=1):
+                key = futures[future]
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    print(f"    [erreur] site {key}: {exc}", file=sys.stderr)
+                    result = _make_result("", None, None, 0.0)
+                    errors += 1
+                known[key] = batch[key] = result
+                fresh.add(key)
+
+                if len(batch) >= 100:
+                    cache.store(batch)
+                    batch = {}
+                if done % 500 == 0 or done == len(todo):
+                    limiter = _get_session()[1]
+                    print(
+                        f"    [{done}/{len(todo)}]  new={len(fresh)}  erreurs={errors}  "
+                        f"débit={limiter.rate:.1f} req/s  ralentissements={limiter.backoffs}",
+                    )
+
+    cache.store(batch)
+    if fresh and export:
+        # Copie versionnée (déployée) : les nouvelles adresses y arrivent
+        exported = cache.export_json()
+        print(f"    [cache] {exported} adresses exportées → {cache.json_path}")
+    cache.close()
+    new_count = len(fresh)
+    print(f"    [{n}/{n}]  cache={cached_count}  new={new_count}  erreurs={errors}")
+
+    results = [known[key] for key in df_sites["address_key"]]
     df_results = pd.DataFrame(results, index=df_sites.index)
     return pd.concat([df_sites, df_results], axis=1)
 
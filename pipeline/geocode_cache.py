@@ -0,0 +1,183 @@
+"""
+Cache disque (SQLite) des résultats de géocodage.
+
+Clé : address_key (empreinte de l'adresse normalisée). Remplace le fichier
+geocode_cache.json, relu en entier au démarrage et réécrit en entier
+toutes les 100 nouvelles adresses :
+
+  - lecture ponctuelle ou groupée des seules adresses demandées
+  - écriture groupée (upsert) des nouveaux résultats
+  - import unique du fichier JSON historique ; ré-importé (sans écraser
+    les entrées existantes) s'il change, p. ex. mis à jour par git
+  - export vers ce même fichier JSON (export_json) après le géocodage de
+    run_pipeline : il reste la copie versionnée, déployée avec l'application
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .config import CACHE_DIR
+
+_SQL_CHUNK = 400        # clés par clause IN (limite de paramètres SQLite)
+_FIELDS = ("geocoded_label", "latitude", "longitude", "score", "status")
+
+GEOCODE_CACHE_DB = "geocode_cache.sqlite"
+GEOCODE_CACHE_JSON = "geocode_cache.json"     # copie versionnée (import / export)
+
+
+class GeocodeCache:
+    """Store SQLite address_key → résultat de géocodage (dict plat)."""
+
+    def __init__(self, cache_dir: Path | str = CACHE_DIR):
+        cache_dir = Path(cache_dir)
+        self.path = cache_dir / GEOCODE_CACHE_DB
+        self._lock = threading.Lock()
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geocodes (
+                address_key    TEXT PRIMARY KEY,
+                geocoded_label TEXT NOT NULL,
+                latitude       REAL,
+                longitude      REAL,
+                score          REAL NOT NULL,
+                status         TEXT NOT NULL,
+                updated_at     REAL NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self.json_path = cache_dir / GEOCODE_CACHE_JSON
+        self._migrate_json(self.json_path)
+
+    # ── Lecture ──────────────────────────────────────────────────────
+
+    def get(self, key: str) -> dict | None:
+        """Résultat d'une adresse, None si absente."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM geocodes WHERE address_key = ?", (key,),
+            ).fetchone()
+        return dict(zip(_FIELDS, row)) if row else None
+
+    def lookup(self, keys) -> dict[str, dict]:
+        """Résultats connus parmi `keys` : {address_key: résultat}."""
+        uniq = list(dict.fromkeys(keys))
+        found: dict[str, dict] = {}
+        with self._lock:
+            for i in range(0, len(uniq), _SQL_CHUNK):
+                chunk = uniq[i:i + _SQL_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT address_key, {', '.join(_FIELDS)} FROM geocodes "
+                    f"WHERE address_key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                found.update({r[0]: dict(zip(_FIELDS, r[1:])) for r in rows})
+        return found
+
+    # ── Écriture ─────────────────────────────────────────────────────
+
+    def store(self, results: dict[str, dict], replace: bool = True) -> int:
+        """
+        Enregistre {address_key: résultat} en une transaction.
+        replace=False : les clés déjà présentes sont conservées.
+        Retourne le nombre de lignes soumises.
+        """
+        now = time.time()
+        rows = [
+            (key, r.get("geocoded_label") or "", r.get("latitude"), r.get("longitude"),
+             float(r.get("score") or 0.0), r.get("status") or "FAILED", now)
+            for key, r in results.items()
+        ]
+        if not rows:
+            return 0
+
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self._lock:
+            self._conn.executemany(
+                f"{verb} INTO geocodes "
+                f"(address_key, {', '.join(_FIELDS)}, updated_at) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def export_json(self, json_path: Path | None = None) -> int:
+        """
+        Réécrit le fichier JSON (format historique) à partir de la base,
+        indenté et clés triées pour des diffs git lisibles. L'empreinte du fichier
+        écrit est mémorisée : il n'est pas ré-importé au démarrage suivant.
+        Retourne le nombre d'adresses exportées.
+        """
+        json_path = Path(json_path or self.json_path)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT address_key, {', '.join(_FIELDS)} FROM geocodes ORDER BY address_key",
+            ).fetchall()
+        data = {r[0]: dict(zip(_FIELDS, r[1:])) for r in rows}
+
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = json_path.with_name(json_path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4, sort_keys=True)
+            f.write("\n")
+        tmp.replace(json_path)
+        self._set_json_stamp(json_path)
+        return len(data)
+
+    @staticmethod
+    def _json_stamp(json_path: Path) -> str:
+        stat = json_path.stat()
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _set_json_stamp(self, json_path: Path) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('json_import', ?)",
+                (self._json_stamp(json_path),),
+            )
+            self._conn.commit()
+
+    def _migrate_json(self, json_path: Path) -> None:
+        """Importe geocode_cache.json (une fois par version du fichier)."""
+        if not json_path.exists():
+            return
+        stamp = self._json_stamp(json_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'json_import'",
+            ).fetchone()
+        if row and row[0] == stamp:
+            return
+
+        t0 = time.time()
+        try:
+            with json_path.open("r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as exc:
+            print(f"    [warn] cache géocodage JSON illisible : {exc}", file=sys.stderr)
+            return
+        count = self.store(legacy, replace=False)
+        self._set_json_stamp(json_path)
+        print(f"    [cache] géocodage : {count} adresses importées de {json_path.name} "
+              f"({time.time() - t0:.1f}s)")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
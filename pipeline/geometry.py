@@ -0,0 +1,124 @@
+"""
+Post-traitement des tracés routiers avant affichage.
+
+OSRM renvoie chaque sommet du réseau (plusieurs dizaines de milliers de
+points pour une longue tournée à pied) : inutile au-delà de ce que l'écran
+peut distinguer. Deux réductions :
+
+  1. Douglas-Peucker avec une tolérance d'un pixel au zoom maximal visé
+     (mètres par pixel Web Mercator à la latitude du tracé)
+  2. coordonnées arrondies à PRECISION décimales (1e-5° ≈ 1 m), au lieu
+     des flottants complets sérialisés par Folium
+
+Le rapport de réduction (points et octets JSON) est retourné avec le tracé.
+"""
+
+import json
+import math
+
+import numpy as np
+
+from .polyline import PRECISION, encode_polyline
+
+SIMPLIFY_ZOOM = 16              # zoom max visé (rue) : ~2 m/pixel à Paris
+SIMPLIFY_PIXELS = 1.0           # tolérance en pixels à ce zoom
+EARTH_M_PER_PIXEL_Z0 = 156_543.034   # Web Mercator, équateur, zoom 0
+
+
+def tolerance_for_zoom(zoom: float, lat: float, pixels: float = SIMPLIFY_PIXELS) -> float:
+    """Tolérance (m) correspondant à `pixels` pixels au zoom donné."""
+    return pixels * EARTH_M_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+def _project_m(points: np.ndarray, lat0: float) -> np.ndarray:
+    """(lat, lon) → plan local en mètres (équirectangulaire)."""
+    scale = 111_320.0
+    return np.column_stack((points[:, 0] * scale, points[:, 1] * scale * math.cos(math.radians(lat0))))
+
+
+def douglas_peucker(points, tolerance_m: float) -> np.ndarray:
+    """
+    Simplification de Douglas-Peucker (itérative, distances vectorisées).
+    Retourne le masque des points conservés (extrémités toujours gardées).
+    """
+    pts = np.asarray(points, dtype=float)
+    n = len(pts)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[[0, -1]] = True
+    if n < 3:
+        return keep
+
+    xy = _project_m(pts, float(pts[:, 0].mean()))
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = xy[first], xy[last]
+        inner = xy[first + 1:last]
+        ab = b - a
+        length2 = float(ab @ ab)
+        if length2 == 0.0:
+            dist = np.sqrt(((inner - a) ** 2).sum(axis=1))
+        else:
+            # Distance au segment [a, b] (et non à la droite : tracés en boucle)
+            t = np.clip(((inner - a) @ ab) / length2, 0.0, 1.0)
+            dist = np.sqrt(((inner - (a + t[:, None] * ab)) ** 2).sum(axis=1))
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance_m:
+            split = first + 1 + k
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+
+def _json_size(segments) -> int:
+    """Taille JSON compacte (mêmes séparateurs en entrée et en sortie)."""
+    return len(json.dumps(segments, separators=(",", ":")))
+
+
+def simplify_geometry(
+    segments: list[list[list[float]]],
+    zoom: float = SIMPLIFY_ZOOM,
+    precision: int = PRECISION,
+) -> tuple[list[list[list[float]]], dict]:
+    """
+    Simplifie chaque segment [[lat, lon], …] pour un affichage jusqu'au
+    zoom donné, coordonnées arrondies à `precision` décimales.
+    Retourne (segments simplifiés, rapport de réduction).
+    """
+    out: list[list[list[float]]] = []
+    for segment in segments:
+        pts = np.asarray(segment, dtype=float)
+        if len(pts) < 3:
+            out.append(np.round(pts, precision).tolist())
+            continue
+        tolerance = tolerance_for_zoom(zoom, float(pts[:, 0].mean()))
+        kept = np.round(pts[douglas_peucker(pts, tolerance)], precision)
+        # L'arrondi peut produire des doublons consécutifs
+        dup = np.zeros(len(kept), dtype=bool)
+        dup[1:] = (kept[1:] == kept[:-1]).all(axis=1)
+        out.append(kept[~dup].tolist())
+
+    report = {
+        "zoom": zoom,
+        "points_in": sum(len(s) for s in segments),
+        "points_out": sum(len(s) for s in out),
+        "bytes_in": _json_size(segments),
+        "bytes_out": _json_size(out),
+        "bytes_encoded": sum(len(encode_polyline(s, precision)) for s in out if s),
+    }
+    return out, report
+
+
+def format_report(report: dict) -> str:
+    """Résumé lisible du rapport de simplify_geometry."""
+    ratio = report["bytes_out"] / report["bytes_in"] if report["bytes_in"] else 1.0
+    return (
+        f"{report['points_in']} → {report['points_out']} points (zoom {report['zoom']}), "
+        f"{report['bytes_in'] / 1024:.0f} → {report['bytes_out'] / 1024:.0f} Ko "
+        f"(-{(1 - ratio) * 100:.1f} %), polyline {report['bytes_encoded'] / 1024:.0f} Ko"
+    )
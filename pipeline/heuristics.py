@@ -0,0 +1,188 @@
+"""
+Moteur TSP heuristique en NumPy pur (alternative à OR-Tools).
+
+  1. construction : plus proche voisin (argmin vectorisé par ligne)
+  2. recherche locale : 2-opt puis Or-opt (segments de 1 à 3 sites),
+     chaque passe évaluant tous les mouvements d'un coup en NumPy
+
+Fonctionne sur des matrices asymétriques : le gain 2-opt tient compte du
+coût du segment parcouru à l'envers (sommes cumulées des deux sens).
+
+Usage : solve_tsp(..., engine="numpy") — réponses en quelques dizaines de
+ms pour les aperçus interactifs ; sert aussi de repli quand OR-Tools ne
+trouve pas de solution.
+"""
+
+import time
+
+import numpy as np
+
+_EPS = 1e-9
+OR_OPT_SEGMENTS = (1, 2, 3)
+
+
+def tour_cost(cost: np.ndarray, tour: list[int] | np.ndarray) -> float:
+    """Coût du cycle tour[0] → … → tour[-1] → tour[0]."""
+    t = np.asarray(tour)
+    return float(cost[t, np.roll(t, -1)].sum())
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Construction
+# ═══════════════════════════════════════════════════════════════════════
+
+def nearest_neighbor(cost: np.ndarray, start: int = 0) -> np.ndarray:
+    """Tour glouton : depuis start, toujours vers le site non visité le plus proche."""
+    n = len(cost)
+    visited = np.zeros(n, dtype=bool)
+    tour = np.empty(n, dtype=int)
+    tour[0] = start
+    visited[start] = True
+    for k in range(1, n):
+        row = np.where(visited, np.inf, cost[tour[k - 1]])
+        tour[k] = int(np.argmin(row))
+        visited[tour[k]] = True
+    return tour
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Recherche locale
+# ═══════════════════════════════════════════════════════════════════════
+
+def _two_opt_pass(cost: np.ndarray, tour: np.ndarray) -> tuple[np.ndarray, float]:
+    """
+    Une passe 2-opt : évalue toutes les inversions p[i+1..j] du chemin fermé
+    p = tour + [tour[0]] (tour[0] reste fixe), puis applique les meilleures
+    inversions améliorantes qui ne se chevauchent pas.
+    Retourne (nouveau tour, gain total).
+    """
+    n = len(tour)
+    p = np.append(tour, tour[0])
+    fwd_edges = cost[p[:-1], p[1:]]
+    bwd_edges = cost[p[1:], p[:-1]]
+    F = np.concatenate(([0.0], np.cumsum(fwd_edges)))   # F[k] = Σ arcs 0..k-1
+    G = np.concatenate(([0.0], np.cumsum(bwd_edges)))
+
+    i = np.arange(n - 1)[:, None]     # arc (p_i, p_i+1)
+    j = np.arange(n)[None, :]         # arc (p_j, p_j+1)
+    valid = j > i + 1
+    jj = np.minimum(j, n - 1)
+    ii = np.minimum(i, n - 1)
+
+    delta = (
+        cost[p[ii], p[jj]] + cost[p[ii + 1], p[jj + 1]]
+        - fwd_edges[ii] - fwd_edges[jj]
+        + (G[jj] - G[ii + 1]) - (F[jj] - F[ii + 1])
+    )
+    delta = np.where(valid, delta, np.inf)
+
+    best_j = np.argmin(delta, axis=1)
+    best = delta[np.arange(n - 1), best_j]
+    candidates = np.flatnonzero(best < -_EPS)
+    if candidates.size == 0:
+        return tour, 0.0
+
+    # Mouvements indépendants (arcs i..j disjoints), meilleurs d'abord
+    gain = 0.0
+    taken = np.zeros(n, dtype=bool)
+    for a in candidates[np.argsort(best[candidates])]:
+        b = int(best_j[a])
+        if taken[a:b + 1].any():
+            continue
+        taken[a:b + 1] = True
+        p[a + 1:b + 1] = p[a + 1:b + 1][::-1]
+        gain -= float(best[a])
+
+    return p[:-1], gain
+
+
+def _or_opt_pass(cost: np.ndarray, tour: np.ndarray, seg: int) -> tuple[np.ndarray, float]:
+    """
+    Une passe Or-opt : déplace le meilleur segment de `seg` sites
+    consécutifs (sens conservé) entre deux autres sites du tour.
+    Retourne (nouveau tour, gain).
+    """
+    n = len(tour)
+    if n < seg + 3:
+        return tour, 0.0
+
+    p = np.append(tour, tour[0])
+    starts = np.arange(1, n - seg + 1)             # segment p[s..s+seg-1], dépôt exclu
+    first = p[starts]
+    last = p[starts + seg - 1]
+    prev = p[starts - 1]
+    nxt = p[starts + seg]
+    removal = cost[prev, first] + cost[last, nxt] - cost[prev, nxt]
+
+    k = np.arange(n)[None, :]                      # insertion sur l'arc (p_k, p_k+1)
+    s = starts[:, None]
+    a, b = p[k], p[k + 1]
+    insert = cost[a, first[:, None]] + cost[last[:, None], b] - cost[a, b]
+    overlap = (k >= s - 1) & (k <= s + seg - 1)
+    delta = np.where(overlap, np.inf, insert - removal[:, None])
+
+    flat = int(np.argmin(delta))
+    si, kk = divmod(flat, n)
+    if not delta[si, kk] < -_EPS:
+        return tour, 0.0
+
+    st = int(starts[si])
+    segment = p[st:st + seg].copy()
+    rest = np.concatenate((p[:st], p[st + seg:-1]))
+    pos = kk + 1 if kk < st else kk + 1 - seg
+    new_tour = np.concatenate((rest[:pos], segment, rest[pos:]))
+    return new_tour, -float(delta[si, kk])
+
+
+def local_search(
+    cost: np.ndarray,
+    tour: np.ndarray,
+    time_limit: float | None = None,
+    trace: list[dict] | None = None,
+) -> np.ndarray:
+    """Alterne 2-opt et Or-opt jusqu'à l'optimum local (ou time_limit)."""
+    t0 = time.monotonic()
+    current = tour_cost(cost, tour)
+    improved = True
+    while improved:
+        if time_limit is not None and time.monotonic() - t0 > time_limit:
+            break
+        improved = False
+        tour, gain = _two_opt_pass(cost, tour)
+        if gain <= _EPS:
+            for seg in OR_OPT_SEGMENTS:
+                tour, gain = _or_opt_pass(cost, tour, seg)
+                if gain > _EPS:
+                    break
+        if gain > _EPS:
+            improved = True
+            current -= gain
+            if trace is not None:
+                trace.append({"t": round(time.monotonic() - t0, 3), "objective": int(round(current))})
+    return tour
+
+
+def solve(
+    cost: np.ndarray,
+    depot: int = 0,
+    time_limit: float | None = None,
+    trace: list[dict] | None = None,
+    initial: list[int] | None = None,
+) -> tuple[list[int], float]:
+    """
+    Plus proche voisin + 2-opt + Or-opt sur la matrice `cost`.
+    initial : tour complet commençant par depot (départ à chaud) — remplace
+    la construction par plus proche voisin.
+    Retourne (tour commençant par depot, coût du cycle).
+    """
+    cost = np.asarray(cost, dtype=float)
+    n = len(cost)
+    if n <= 3:
+        tour = nearest_neighbor(cost, depot) if n else np.array([], dtype=int)
+        return tour.tolist(), tour_cost(cost, tour) if n else 0.0
+
+    tour = np.asarray(initial) if initial is not None else nearest_neighbor(cost, depot)
+    if trace is not None:
+        trace.append({"t": 0.0, "objective": int(round(tour_cost(cost, tour)))})
+    tour = local_search(cost, tour, time_limit=time_limit, trace=trace)
+    return tour.tolist(), tour_cost(cost, tour)
@@ -0,0 +1,191 @@
+"""
+Calculs d'itinéraire asynchrones (API /api/jobs).
+
+Un job = une fonction exécutée sur un pool de threads borné : au plus
+JOB_WORKERS calculs simultanés, les suivants attendent en file. Le
+serveur web reste ainsi disponible pendant les calculs longs (matrice
+OSRM, TSP, géométrie).
+
+Chaque job publie sa progression (étape, message, pourcentage) ; les
+clients interrogent son statut ou s'abonnent au flux d'événements (SSE).
+
+Annulation coopérative : la fonction reçoit un callback `progress(stage,
+message, percent)` qui lève JobCancelled dès l'étape suivante si le job a
+été annulé ; un job encore en file est annulé immédiatement.
+
+États : queued → running → done | error | cancelled
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))   # calculs simultanés
+JOB_TTL_S = 30 * 60     # jobs terminés conservés 30 min
+JOB_MAX = 200           # jobs gardés en mémoire (les plus anciens terminés partent)
+
+FINISHED = ("done", "error", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Levée par progress() quand le job a été annulé."""
+
+
+class Job:
+    """État d'un calcul : statut, progression, résultat et journal d'événements."""
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = "queued"
+        self.stage = "queued"
+        self.message = "En attente…"
+        self.percent = 0
+        self.result: dict | None = None
+        self.http_status = 200
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.events: list[dict] = []
+        self.future: Future | None = None
+        self._cancel = threading.Event()
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def snapshot(self) -> dict:
+        """Statut sérialisable (sans le résultat)."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "message": self.message,
+            "percent": self.percent,
+            "error": self.error,
+            "elapsed_s": round((self.finished_at or time.time()) - self.created_at, 2),
+        }
+
+    def publish(self, **fields) -> None:
+        """Met à jour l'état et notifie les abonnés (SSE, attente)."""
+        with self._cond:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            if self.finished and self.finished_at is None:
+                self.finished_at = time.time()
+            self.events.append(self.snapshot())
+            self._cond.notify_all()
+
+    def progress(self, stage: str, message: str = "", percent: int | None = None) -> None:
+        """Callback passé au calcul : publie l'étape, interrompt si annulé."""
+        if self.cancelled:
+            raise JobCancelled(self.id)
+        self.publish(
+            stage=stage,
+            message=message,
+            percent=self.percent if percent is None else percent,
+        )
+
+    def wait_events(self, seen: int, timeout: float) -> list[dict]:
+        """Événements publiés après les `seen` premiers (attend au plus timeout s)."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > seen or self.finished, timeout)
+            return self.events[seen:]
+
+
+class JobManager:
+    """Pool borné de jobs, indexés par identifiant."""
+
+    def __init__(self, workers: int = JOB_WORKERS, ttl_s: float = JOB_TTL_S):
+        self.ttl_s = ttl_s
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args) -> Job:
+        """
+        Planifie fn(*args, progress) ; fn retourne (payload, http_status).
+        Un statut ≥ 400 termine le job en erreur (payload["error"]).
+        """
+        job = Job(uuid.uuid4().hex)
+        with self._lock:
+            self._purge()
+            self._jobs[job.id] = job
+        job.publish()
+        job.future = self._pool.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job: Job, fn: Callable, args: tuple) -> None:
+        if job.cancelled:
+            return
+        job.publish(status="running", stage="start", message="Démarrage…")
+        try:
+            payload, http_status = fn(*args, job.progress)
+        except JobCancelled:
+            job.publish(status="cancelled", message="Annulé")
+            return
+        except Exception as exc:
+            job.publish(status="error", error=str(exc), http_status=500, message="Erreur")
+            return
+
+        if http_status >= 400:
+            job.publish(
+                status="error", error=payload.get("error", "Erreur"),
+                http_status=http_status, result=payload, message="Erreur",
+            )
+        else:
+            job.publish(
+                status="done", stage="done", message="Terminé",
+                percent=100, result=payload, http_status=http_status,
+            )
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Demande l'annulation ; immédiate si le job attend encore en file."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            job.publish(status="cancelled", message="Annulé")
+        else:
+            job.publish(message="Annulation demandée…")
+        return job
+
+    def _purge(self) -> None:
+        """Oublie les jobs terminés expirés, puis les plus anciens au-delà de JOB_MAX."""
+        now = time.time()
+        finished = sorted(
+            (j for j in self._jobs.values() if j.finished),
+            key=lambda j: j.finished_at or 0,
+        )
+        for job in finished:
+            if now - (job.finished_at or now) > self.ttl_s or len(self._jobs) >= JOB_MAX:
+                del self._jobs[job.id]
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Instance partagée (lazy-init)
+# ═══════════════════════════════════════════════════════════════════════
+
+_manager: JobManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Retourne le gestionnaire partagé, créé à la première utilisation."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
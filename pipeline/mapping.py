@@ -4,6 +4,9 @@ PHASE 5 & 8 — Cartes interactives (Folium).
 Deux cartes :
   A) map_sites.html  : tous les sites géocodés, colorés par score
   B) map_route.html  : itinéraire optimal avec polyline + marqueurs ordonnés
+
+Variante compacte de B pour l'interface web : marqueurs en GeoJSON et
+tracé en polylignes encodées, rendus côté client (Leaflet).
 """
 
 from pathlib import Path
@@ -12,6 +15,7 @@ import folium
 import pandas as pd
 
 from .config import OUTPUT_DIR
+from .polyline import encode_polyline
 
 # ── Couleurs par statut ──────────────────────────────────────────────
 STATUS_COLORS = {"OK": "#2ecc71", "WARNING": "#f39c12", "FAILED": "#e74c3c"}
@@ -201,6 +205,64 @@ def create_route_map(
     return m
 
 
+# ═══════════════════════════════════════════════════════════════════════
+#  Carte compacte (GeoJSON + polyligne encodée, rendu côté client)
+# ═══════════════════════════════════════════════════════════════════════
+
+def _point(lat: float, lon: float, properties: dict) -> dict:
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [round(float(lon), 5), round(float(lat), 5)]},
+        "properties": properties,
+    }
+
+
+def compact_route_map(
+    df_routable: pd.DataFrame,
+    route_order: list[int],
+    route_geometry: list[list[list[float]]] | None = None,
+    df_visited: pd.DataFrame | None = None,
+) -> dict:
+    """
+    Même contenu que create_route_map, sans HTML : {"center", "markers"
+    (FeatureCollection), "polylines" (une polyligne encodée par segment)}.
+    Les popups sont construites côté client à partir de la réponse
+    (« route_index » renvoie à la liste route de /api/generate).
+    """
+    if df_routable.empty or not route_order:
+        return {"center": [46.6, 2.3], "markers": {"type": "FeatureCollection", "features": []}, "polylines": []}
+
+    if route_geometry:
+        lines = route_geometry
+    else:
+        lines = [[[df_routable.iloc[i]["latitude"], df_routable.iloc[i]["longitude"]] for i in route_order]]
+
+    n = len(route_order)
+    features = []
+    for order, idx in enumerate(route_order):
+        row = df_routable.iloc[idx]
+        kind = "start" if order == 0 else ("end" if order == n - 1 else "stop")
+        features.append(_point(row["latitude"], row["longitude"], {
+            "kind": kind,
+            "order": order + 1,
+            "route_index": order,
+            "label": str(row.get("geocoded_label", "")),
+        }))
+
+    if df_visited is not None and not df_visited.empty:
+        for _, row in df_visited.iterrows():
+            features.append(_point(row["latitude"], row["longitude"], {
+                "kind": "visited",
+                "label": str(row.get("geocoded_label", "")),
+            }))
+
+    return {
+        "center": [round(float(df_routable["latitude"].mean()), 5), round(float(df_routable["longitude"].mean()), 5)],
+        "markers": {"type": "FeatureCollection", "features": features},
+        "polylines": [encode_polyline(line) for line in lines if len(line) > 1],
+    }
+
+
 # ═══════════════════════════════════════════════════════════════════════
 #  Export
 # ═══════════════════════════════════════════════════════════════════════
@@ -0,0 +1,229 @@
+"""
+PHASE 9 — Matrices de durées précalculées par zone (batch nocturne).
+
+Une zone = un code postal de df_sites (arrondissement, commune…).
+Pour chaque zone et chaque profil OSRM, la matrice NxN est calculée hors
+ligne puis stockée en secondes entières (uint32) :
+
+    output/matrices/<profil>/<code_postal>.npy         matrice NxN uint32
+    output/matrices/<profil>/<code_postal>.keys.json   index : site_key par ligne
+
+Au runtime, seul l'index des site_key est chargé (keys.json + en-tête .npy
+pour la forme) ; une matrice n'est ouverte en memory-map (np.load
+mmap_mode="r") qu'au premier lookup qui la touche, et au plus
+MATRIX_OPEN_MAX restent ouvertes (LRU) — chaque memmap garde un
+descripteur de fichier. La sous-matrice d'une requête est lue par fancy
+indexing, sans charger la zone entière en RAM. Seules les
+paires absentes (point de départ, paires entre deux zones) passent par le
+cache disque puis par OSRM.
+
+Les fichiers sont remplacés atomiquement (rename) : la date de
+modification du dossier d'un profil change à chaque reconstruction, et
+les processus en cours (workers gunicorn) rechargent alors l'index au
+lookup suivant, sans redémarrage.
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .config import DURATION_DTYPE, MATRIX_DIR
+from .osrm_cache import site_key
+
+MATRIX_OPEN_MAX = 64  # memmaps ouverts simultanément (un descripteur chacun)
+
+
+def _write_atomic(path: Path, write) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        write(f)
+    tmp.replace(path)
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Construction (run_pipeline.py --phases 9)
+# ═══════════════════════════════════════════════════════════════════════
+
+def build_zone_matrices(
+    df_routable: pd.DataFrame,
+    profile: str = "driving",
+    output_dir: Path | str | None = None,
+    min_sites: int = 2,
+) -> list[Path]:
+    """
+    Calcule et enregistre une matrice par code postal de df_routable.
+    Les durées sont redemandées à OSRM : ni les matrices existantes ni le
+    cache de paires ne sont relus, sinon le rafraîchissement réécrirait
+    les anciennes valeurs.
+    Retourne la liste des fichiers écrits.
+    """
+    from .routing import compute_duration_matrix
+
+    out = Path(output_dir) if output_dir else MATRIX_DIR
+    out = out / profile
+    out.mkdir(parents=True, exist_ok=True)
+
+    zones = df_routable.groupby("postal_code_clean", sort=True)
+    n_zones = zones.ngroups
+    paths: list[Path] = []
+
+    for z, (zone, group) in enumerate(zones, start=1):
+        if not zone or len(group) < min_sites:
+            continue
+
+        # Un site par site_key (deux adresses peuvent partager un point)
+        sites: dict[str, tuple[float, float]] = {}
+        for lat, lon in zip(group["latitude"], group["longitude"]):
+            sites.setdefault(site_key(lat, lon), (lat, lon))
+        keys = list(sites)
+        coords = list(sites.values())
+
+        t0 = time.time()
+        print(f"  [{z}/{n_zones}] zone {zone} : {len(keys)} sites ({profile})")
+        matrix = compute_duration_matrix(coords, profile=profile, use_cache=False)
+
+        path = out / f"{zone}.npy"
+        _write_atomic(path, lambda f: np.save(f, matrix.astype(DURATION_DTYPE, copy=False)))
+        _write_atomic(
+            out / f"{zone}.keys.json",
+            lambda f: f.write(json.dumps(keys).encode("utf-8")),
+        )
+        paths.append(path)
+        print(f"    → {path.name} ({time.time() - t0:.1f}s)")
+
+    return paths
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Lecture (runtime)
+# ═══════════════════════════════════════════════════════════════════════
+
+class MatrixStore:
+    """Matrices de zones en memory-map, indexées par site_key."""
+
+    def __init__(self, root: Path | str = MATRIX_DIR, max_open: int = MATRIX_OPEN_MAX):
+        self.root = Path(root)
+        self.max_open = max_open
+        # profil → {site_key: (zone, index)} ; memmaps ouverts : (profil, zone) → uint32 (LRU)
+        self._index: dict[str, dict[str, tuple[str, int]]] = {}
+        self._open: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+        self._stamps: dict[str, int | None] = {}
+        self._lock = threading.Lock()
+
+    def _stamp(self, profile: str) -> int | None:
+        """Date de modification (ns) du dossier du profil, None s'il n'existe pas."""
+        try:
+            return (self.root / profile).stat().st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def _npy_shape(path: Path) -> tuple[int, ...]:
+        """Forme du tableau d'après l'en-tête .npy (fichier refermé aussitôt)."""
+        with path.open("rb") as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, _, _ = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, _, _ = np.lib.format.read_array_header_2_0(f)
+        return shape
+
+    def _load_profile(self, profile: str, stamp: int | None) -> None:
+        index: dict[str, tuple[str, int]] = {}
+        n_zones = 0
+        folder = self.root / profile
+        for path in sorted(folder.glob("*.npy")) if folder.is_dir() else []:
+            zone = path.stem
+            try:
+                keys = json.loads((folder / f"{zone}.keys.json").read_text("utf-8"))
+                shape = self._npy_shape(path)
+            except (OSError, ValueError) as exc:
+                print(f"    [warn] matrice {path.name} illisible : {exc}", file=sys.stderr)
+                continue
+            if shape != (len(keys), len(keys)):
+                print(f"    [warn] matrice {path.name} : index incohérent", file=sys.stderr)
+                continue
+            n_zones += 1
+            for i, key in enumerate(keys):
+                index.setdefault(key, (zone, i))
+        for cached in [k for k in self._open if k[0] == profile]:
+            del self._open[cached]
+        self._index[profile] = index
+        self._stamps[profile] = stamp
+        if n_zones:
+            print(f"  [matrices] {profile} : {n_zones} zones, {len(index)} sites")
+
+    def _matrix(self, profile: str, zone: str) -> np.ndarray | None:
+        """Memmap de la zone (ouvert au besoin, LRU borné) ; None si illisible."""
+        key = (profile, zone)
+        matrix = self._open.get(key)
+        if matrix is not None:
+            self._open.move_to_end(key)
+            return matrix
+        path = self.root / profile / f"{zone}.npy"
+        try:
+            matrix = np.load(path, mmap_mode="r")
+        except (OSError, ValueError) as exc:
+            print(f"    [warn] matrice {path.name} illisible : {exc}", file=sys.stderr)
+            return None
+        self._open[key] = matrix
+        while len(self._open) > self.max_open:
+            self._open.popitem(last=False)
+        return matrix
+
+    def lookup(self, profile: str, keys: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Lit la sous-matrice keys × keys à partir des matrices de zones
+        (seules les lignes/colonnes demandées sont lues sur disque).
+        Seules les paires dont les deux sites sont dans la même zone sont
+        trouvées. Retourne (valeurs, trouvé) : deux arrays (N, N).
+        L'index est rechargé si les matrices du profil ont été reconstruites.
+        """
+        with self._lock:
+            stamp = self._stamp(profile)
+            if profile not in self._index or self._stamps.get(profile) != stamp:
+                self._load_profile(profile, stamp)
+            index = self._index[profile]
+
+        n = len(keys)
+        values = np.zeros((n, n), dtype=DURATION_DTYPE)
+        found = np.zeros((n, n), dtype=bool)
+
+        by_zone: dict[str, tuple[list[int], list[int]]] = {}
+        for pos, key in enumerate(keys):
+            hit = index.get(key)
+            if hit is not None:
+                positions, rows = by_zone.setdefault(hit[0], ([], []))
+                positions.append(pos)
+                rows.append(hit[1])
+
+        for zone, (positions, rows) in by_zone.items():
+            with self._lock:
+                matrix = self._matrix(profile, zone)
+            if matrix is None or max(rows) >= len(matrix):
+                continue
+            cells = np.ix_(positions, positions)
+            values[cells] = matrix[np.ix_(rows, rows)]
+            found[cells] = True
+
+        return values, found
+
+    def __len__(self) -> int:
+        return sum(len(idx) for idx in self._index.values())
+
+
+_store: MatrixStore | None = None
+
+
+def get_matrix_store() -> MatrixStore:
+    """Store partagé (lazy-init) ; vide si aucune matrice n'a été précalculée."""
+    global _store
+    if _store is None:
+        _store = MatrixStore()
+    return _store
@@ -0,0 +1,302 @@
+"""
+Cache disque (SQLite) des durées OSRM par paire de sites, et des tracés
+routiers de chaque tronçon (site A → site B).
+
+Clé : (profil, site A, site B). Un site est identifié par ses coordonnées
+arrondies à 5 décimales — même convention que les site_id des visites.
+
+Implémente :
+  - lecture groupée d'une sous-matrice (seules les paires absentes
+    sont ensuite demandées à OSRM)
+  - écriture groupée des blocs reçus
+  - tracés par tronçon stockés en « encoded polyline » : une tournée
+    réordonnée se reconstruit à partir des tronçons déjà connus
+  - expiration (TTL) et plafond de taille avec éviction LRU
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .config import (
+    DURATION_DTYPE,
+    OSRM_CACHE_MAX_LEGS,
+    OSRM_CACHE_MAX_PAIRS,
+    OSRM_CACHE_PATH,
+    OSRM_CACHE_TTL_DAYS,
+)
+
+_SQL_CHUNK = 400        # clés par clause IN (limite de paramètres SQLite)
+_EVICT_RATIO = 0.9      # après éviction : 90 % du plafond
+_EVICT_EVERY = 100      # recomptage au moins toutes les 100 écritures (autres processus)
+
+
+def site_key(lat: float, lon: float) -> str:
+    """Identifiant stable d'un site : 'lat,lon' arrondi à 5 décimales."""
+    return f"{lat:.5f},{lon:.5f}"
+
+
+class DurationCache:
+    """Store SQLite des durées (secondes) entre paires de sites."""
+
+    def __init__(
+        self,
+        path: Path | str = OSRM_CACHE_PATH,
+        max_pairs: int = OSRM_CACHE_MAX_PAIRS,
+        ttl_days: float = OSRM_CACHE_TTL_DAYS,
+        max_legs: int = OSRM_CACHE_MAX_LEGS,
+    ):
+        self.path = Path(path)
+        self.max_pairs = max_pairs
+        self.max_legs = max_legs
+        self.ttl_s = ttl_days * 86400
+        self._lock = threading.Lock()
+        # table → majorant du nombre de lignes (None : à recompter) et
+        # écritures depuis le dernier recomptage
+        self._rows: dict[str, int | None] = {"pairs": None, "legs": None}
+        self._writes: dict[str, int] = {"pairs": 0, "legs": 0}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pairs (
+                profile    TEXT NOT NULL,
+                src        TEXT NOT NULL,
+                dst        TEXT NOT NULL,
+                duration   REAL NOT NULL,
+                fetched_at REAL NOT NULL,
+                used_at    REAL NOT NULL,
+                PRIMARY KEY (profile, src, dst)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pairs_used_at ON pairs (used_at)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS legs (
+                profile    TEXT NOT NULL,
+                src        TEXT NOT NULL,
+                dst        TEXT NOT NULL,
+                polyline   TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                used_at    REAL NOT NULL,
+                PRIMARY KEY (profile, src, dst)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS legs_used_at ON legs (used_at)"
+        )
+        self._conn.commit()
+
+    # ── Lecture ──────────────────────────────────────────────────────
+
+    def lookup(
+        self,
+        profile: str,
+        src_keys: list[str],
+        dst_keys: list[str] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Lit le bloc src_keys × dst_keys (dst_keys=None → src_keys × src_keys).
+        Retourne (valeurs, trouvé) : deux arrays (S, D), DURATION_DTYPE et bool.
+        Les entrées expirées sont ignorées ; les entrées lues sont « touchées »
+        pour l'éviction LRU.
+        """
+        if dst_keys is None:
+            dst_keys = src_keys
+        src_uniq = list(dict.fromkeys(src_keys))
+        dst_uniq = list(dict.fromkeys(dst_keys))
+        src_pos = {k: i for i, k in enumerate(src_uniq)}
+        dst_pos = {k: i for i, k in enumerate(dst_uniq)}
+        values = np.zeros((len(src_uniq), len(dst_uniq)), dtype=DURATION_DTYPE)
+        found = np.zeros(values.shape, dtype=bool)
+
+        now = time.time()
+        min_fetched = now - self.ttl_s
+        src_chunks = [src_uniq[i:i + _SQL_CHUNK] for i in range(0, len(src_uniq), _SQL_CHUNK)]
+        dst_chunks = [dst_uniq[i:i + _SQL_CHUNK] for i in range(0, len(dst_uniq), _SQL_CHUNK)]
+
+        with self._lock:
+            for src_chunk in src_chunks:
+                for dst_chunk in dst_chunks:
+                    where = (
+                        f"profile = ? AND fetched_at >= ? "
+                        f"AND src IN ({','.join('?' * len(src_chunk))}) "
+                        f"AND dst IN ({','.join('?' * len(dst_chunk))})"
+                    )
+                    args = [profile, min_fetched, *src_chunk, *dst_chunk]
+                    rows = self._conn.execute(
+                        f"SELECT src, dst, duration FROM pairs WHERE {where}", args,
+                    ).fetchall()
+                    if not rows:
+                        continue
+                    r = [src_pos[s] for s, _, _ in rows]
+                    c = [dst_pos[d] for _, d, _ in rows]
+                    values[r, c] = np.rint([v for _, _, v in rows])
+                    found[r, c] = True
+                    self._conn.execute(
+                        f"UPDATE pairs SET used_at = ? WHERE {where}", [now, *args],
+                    )
+            self._conn.commit()
+
+        ri = [src_pos[k] for k in src_keys]
+        ci = [dst_pos[k] for k in dst_keys]
+        return values[np.ix_(ri, ci)], found[np.ix_(ri, ci)]
+
+    # ── Écriture ─────────────────────────────────────────────────────
+
+    def store(
+        self,
+        profile: str,
+        keys: list[str],
+        matrix: np.ndarray,
+        mask: np.ndarray,
+    ) -> int:
+        """
+        Enregistre les paires (i, j) où mask[i, j] est vrai (diagonale exclue).
+        Retourne le nombre de paires écrites.
+        """
+        now = time.time()
+        rows = [
+            (profile, keys[i], keys[j], int(matrix[i, j]), now, now)
+            for i, j in zip(*np.nonzero(mask))
+            if keys[i] != keys[j]
+        ]
+        if not rows:
+            return 0
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pairs "
+                "(profile, src, dst, duration, fetched_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(now, "pairs", self.max_pairs, len(rows))
+            self._conn.commit()
+        return len(rows)
+
+    # ── Tracés de tronçons ───────────────────────────────────────────
+
+    def lookup_legs(self, profile: str, pairs: list[tuple[str, str]]) -> dict[tuple[str, str], str]:
+        """
+        Tracés connus (encoded polyline) des tronçons demandés.
+        Retourne {(src, dst): polyline} ; les tronçons absents ou expirés
+        n'y figurent pas. Les entrées lues sont « touchées » (LRU).
+        """
+        wanted = list(dict.fromkeys(pairs))
+        step = _SQL_CHUNK // 2          # deux paramètres par tronçon
+
+        now = time.time()
+        found: dict[tuple[str, str], str] = {}
+        with self._lock:
+            for i in range(0, len(wanted), step):
+                chunk = wanted[i:i + step]
+                # Jointure sur les tronçons demandés : une recherche par clé
+                # primaire (profile, src, dst) par tronçon
+                rows = self._conn.execute(
+                    f"SELECT l.src, l.dst, l.polyline "
+                    f"FROM (VALUES {','.join(['(?, ?)'] * len(chunk))}) AS w "
+                    f"JOIN legs AS l ON l.profile = ? AND l.src = w.column1 AND l.dst = w.column2 "
+                    f"WHERE l.fetched_at >= ?",
+                    [*(key for pair in chunk for key in pair), profile, now - self.ttl_s],
+                ).fetchall()
+                found.update({(s, d): p for s, d, p in rows})
+            if found:
+                self._conn.executemany(
+                    "UPDATE legs SET used_at = ? WHERE profile = ? AND src = ? AND dst = ?",
+                    [(now, profile, s, d) for s, d in found],
+                )
+                self._conn.commit()
+        return found
+
+    def store_legs(self, profile: str, legs: dict[tuple[str, str], str]) -> int:
+        """Enregistre les tracés {(src, dst): polyline} ; retourne leur nombre."""
+        now = time.time()
+        rows = [(profile, s, d, p, now, now) for (s, d), p in legs.items() if s != d]
+        if not rows:
+            return 0
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO legs "
+                "(profile, src, dst, polyline, fetched_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(now, "legs", self.max_legs, len(rows))
+            self._conn.commit()
+        return len(rows)
+
+    def _evict(self, now: float, table: str, max_rows: int, written: int) -> None:
+        """
+        Supprime les entrées expirées puis les moins récemment utilisées.
+        Le nombre de lignes n'est recompté que lorsque son majorant (dernier
+        comptage + lignes écrites depuis) dépasse le plafond, ou toutes les
+        _EVICT_EVERY écritures pour tenir compte des autres processus.
+        """
+        bound = self._rows[table]
+        self._writes[table] += 1
+        if bound is not None:
+            bound += written
+            if bound <= max_rows and self._writes[table] < _EVICT_EVERY:
+                self._rows[table] = bound
+                return
+
+        self._writes[table] = 0
+        self._conn.execute(
+            f"DELETE FROM {table} WHERE fetched_at < ?", (now - self.ttl_s,),
+        )
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        self._rows[table] = count
+        if count <= max_rows:
+            return
+
+        keep = int(max_rows * _EVICT_RATIO)
+        self._conn.execute(
+            f"DELETE FROM {table} WHERE (profile, src, dst) IN ("
+            f"  SELECT profile, src, dst FROM {table} ORDER BY used_at LIMIT ?"
+            ")",
+            (count - keep,),
+        )
+        self._rows[table] = keep
+        print(f"    [cache] OSRM : éviction LRU ({count} → {keep} {table})")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pairs").fetchone()[0]
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Instance partagée (lazy-init)
+# ═══════════════════════════════════════════════════════════════════════
+
+_cache: DurationCache | None = None
+_cache_failed = False
+
+
+def get_duration_cache() -> DurationCache | None:
+    """
+    Retourne le cache partagé, ouvert à la première utilisation.
+    None si le fichier ne peut pas être ouvert (disque en lecture seule…) :
+    le calcul de matrice continue alors sans cache.
+    """
+    global _cache, _cache_failed
+    if _cache is not None or _cache_failed:
+        return _cache
+    try:
+        _cache = DurationCache()
+    except (sqlite3.Error, OSError) as exc:
+        print(f"    [warn] cache OSRM indisponible : {exc}", file=sys.stderr)
+        _cache_failed = True
+    return _cache
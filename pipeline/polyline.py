@@ -0,0 +1,46 @@
+"""
+Format « encoded polyline » (Google / OSRM, précision 1e-5°).
+
+Sert à stocker les géométries OSRM (cache des tronçons) et à transmettre
+le tracé au navigateur (carte compacte).
+"""
+
+import numpy as np
+
+PRECISION = 5
+
+
+def encode_polyline(points, precision: int = PRECISION) -> str:
+    """Encode [[lat, lon], …] en chaîne polyline."""
+    if len(points) == 0:
+        return ""
+    factor = 10 ** precision
+    scaled = np.rint(np.asarray(points, dtype=float) * factor).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+
+    chars = []
+    for value in deltas.ravel().tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+def decode_polyline(encoded: str, precision: int = PRECISION) -> list[list[float]]:
+    """Décode une chaîne polyline en [[lat, lon], …]."""
+    values = []
+    result = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        result |= (byte & 0x1F) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+            result = shift = 0
+
+    if not values:
+        return []
+    coords = np.cumsum(np.asarray(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return coords.tolist()
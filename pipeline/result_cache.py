@@ -0,0 +1,113 @@
+"""
+Cache mémoire des résultats de /api/generate (route, stats, carte HTML).
+
+Clé : empreinte SHA-256 de la requête normalisée (valeurs par défaut
+retirées, textes nettoyés, coordonnées arrondies à 5 décimales) et de
+l'ensemble des sites déjà visités — deux commerciaux demandant la même
+zone avec les mêmes options partagent le résultat.
+
+Expiration (TTL) et plafond d'entrées avec éviction LRU ; l'application
+vide le cache à chaque modification des visites.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_MAX = 32            # entrées (une carte HTML pèse ~1 Mo)
+RESULT_CACHE_TTL_S = 6 * 3600    # 6 h
+
+
+def _normalize(value):
+    """Forme canonique d'une valeur de requête (JSON stable)."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, float):
+        return round(value, 5)
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _coerce(value, kind: type):
+    """Convertit comme le handler (int("2"), bool(1)…) ; valeur inchangée si impossible."""
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def request_key(
+    body: dict,
+    visited_ids,
+    defaults: dict | None = None,
+    types: dict[str, type] | None = None,
+) -> str:
+    """
+    Empreinte de (requête, sites visités). Les champs vides ou égaux à leur
+    valeur par défaut sont ignorés : {} et {"closed_loop": false} coïncident.
+    types : conversion appliquée par champ avant comparaison, pour que
+    {"tsp_limit": "2"} et {"tsp_limit": 2} partagent la même clé.
+    """
+    defaults = defaults or {}
+    types = types or {}
+    params = {}
+    for key, value in body.items():
+        if key in types and value is not None:
+            value = _coerce(value, types[key])
+        value = _normalize(value)
+        if value in (None, "", [], {}) or (key in defaults and value == defaults[key]):
+            continue
+        if key == "city":
+            value = str(value).upper()
+        params[key] = value
+
+    canonical = json.dumps(
+        {"request": params, "visited": sorted(visited_ids)},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Dictionnaire LRU à expiration, partagé entre threads."""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX, ttl_s: float = RESULT_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_s:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
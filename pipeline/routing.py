@@ -11,9 +11,13 @@ Limites :
 """
 
 import json
-import math
+import multiprocessing as mp
+import os
 import sys
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import shared_memory
 from pathlib import Path
 from urllib.error import HTTPError, URLError
 from urllib.parse import urlencode
@@ -23,7 +27,11 @@ import numpy as np
 import pandas as pd
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
 
-from .config import OUTPUT_DIR
+from . import heuristics
+from .config import DURATION_DTYPE, OUTPUT_DIR
+from .matrix_store import get_matrix_store
+from .osrm_cache import get_duration_cache, site_key
+from .polyline import decode_polyline, encode_polyline
 
 # ── Constantes OSRM ─────────────────────────────────────────────────
 # Le serveur public project-osrm.org ne supporte que driving.
@@ -37,7 +45,13 @@ OSRM_BATCH = 50          # coordonnées par bloc
 OSRM_SLEEP = 1.0         # secondes entre requêtes (serveur public)
 OSRM_TIMEOUT = 60
 OSRM_RETRIES = 3
-LARGE_DURATION = 999_999  # secondes (≈ 278 h) pour routes introuvables
+# Lots Table exécutés en parallèle sous un budget requêtes/s.
+# Serveur public : garder ~1 req/s. OSRM local : OSRM_RPS=50 OSRM_WORKERS=8.
+OSRM_RPS = float(os.environ.get("OSRM_RPS", 1 / OSRM_SLEEP))
+OSRM_WORKERS = int(os.environ.get("OSRM_WORKERS", 4))
+LARGE_DURATION = 999_999  # secondes (≈ 278 h) pour routes introuvables — sentinelle
+                          # explicite, tient en DURATION_DTYPE (uint32)
+SYMMETRY_WARN = 0.15      # p95 d'asymétrie relative au-delà duquel le mode symétrique est risqué
 
 
 # ═══════════════════════════════════════════════════════════════════════
@@ -85,71 +99,304 @@ def _osrm_table(
     return {}
 
 
-def compute_duration_matrix(
+def _durations_block(data: dict, shape: tuple[int, int]) -> np.ndarray:
+    """
+    Convertit la réponse OSRM Table en bloc NumPy (secondes, DURATION_DTYPE).
+    Les durées null (route introuvable) deviennent LARGE_DURATION.
+    La liste JSON est retirée du dict pour être libérée au plus tôt.
+    """
+    block = np.array(data.pop("durations", None) or [], dtype=float)
+    if block.shape != shape:
+        raise RuntimeError(f"OSRM : bloc {block.shape} reçu, {shape} attendu")
+    block[np.isnan(block)] = LARGE_DURATION
+    return np.rint(np.clip(block, 0, LARGE_DURATION)).astype(DURATION_DTYPE)
+
+
+def _block_index(rows: np.ndarray, cols: np.ndarray) -> tuple:
+    """Index NumPy du bloc rows × cols : slices si contigus, sinon np.ix_."""
+    def as_slice(idx: np.ndarray):
+        if len(idx) and (np.diff(idx) == 1).all():
+            return slice(int(idx[0]), int(idx[-1]) + 1)
+        return None
+
+    rs, cs = as_slice(rows), as_slice(cols)
+    if rs is not None and cs is not None:
+        return rs, cs
+    return np.ix_(rows, cols)
+
+
+def _missing_cover(missing: np.ndarray) -> np.ndarray:
+    """
+    Choisit un ensemble S d'indices tel que toute paire manquante (i, j)
+    ait i ∈ S ou j ∈ S (couverture gloutonne).
+    Les sites sans aucune paire en cache (nouveaux sites) sont pris d'office.
+    Degrés mis à jour à chaque choix (O(n) par site retenu, O(n²) au total).
+    """
+    n = len(missing)
+    off_diag = n * n - n
+    if missing.sum() >= off_diag:
+        return np.arange(n)
+
+    new = missing.sum(axis=1) + missing.sum(axis=0) >= 2 * (n - 1)
+    cover = list(np.flatnonzero(new))
+    rest = missing.copy()
+    rest[new, :] = False
+    rest[:, new] = False
+
+    degree = rest.sum(axis=1) + rest.sum(axis=0)
+    while True:
+        k = int(np.argmax(degree))
+        if degree[k] == 0:
+            break
+        cover.append(k)
+        # Les paires (k, j) et (j, k) ne comptent plus pour j
+        degree -= rest[k, :]
+        degree -= rest[:, k]
+        degree[k] = 0
+        rest[k, :] = False
+        rest[:, k] = False
+
+    return np.array(sorted(cover), dtype=int)
+
+
+def _fetch_blocks(
     coords: list[tuple[float, float]],
+    blocks: list[tuple[np.ndarray, np.ndarray]],
+    matrix: np.ndarray,
     profile: str = DEFAULT_PROFILE,
+    rps: float = OSRM_RPS,
+    workers: int = OSRM_WORKERS,
+    symmetric: bool = False,
 ) -> np.ndarray:
     """
-    Calcule la matrice NxN de durées de trajet (secondes) via OSRM Table.
-    Gère le batching pour les grands jeux de coordonnées.
+    Remplit matrix[rows × cols] pour chaque bloc (rows, cols) via OSRM Table,
+    découpé en lots de OSRM_BATCH sources × OSRM_BATCH destinations.
+    Les lots tournent sur `workers` threads, limités à `rps` requêtes/s
+    (le retry par lot reste géré par _osrm_table).
+    symmetric=True : pour un bloc carré (rows == cols), seuls les lots du
+    triangle supérieur sont demandés.
 
-    Retourne un np.ndarray de shape (N, N).
-    Les routes introuvables valent LARGE_DURATION.
+    Retourne le masque (N, N) des paires effectivement reçues d'OSRM
+    (les lots en échec restent à LARGE_DURATION et ne sont pas marqués).
     """
-    n = len(coords)
-    if n == 0:
-        return np.array([[]])
-    if n == 1:
-        return np.array([[0.0]])
-
     B = OSRM_BATCH
-    n_chunks = math.ceil(n / B)
-    total_calls = n_chunks * n_chunks
-    matrix = np.full((n, n), LARGE_DURATION, dtype=float)
-
-    call = 0
-    for ci in range(n_chunks):
-        si, ei = ci * B, min((ci + 1) * B, n)
-        src_coords = coords[si:ei]
-
-        for cj in range(n_chunks):
-            sj, ej = cj * B, min((cj + 1) * B, n)
-            dst_coords = coords[sj:ej]
-
-            # Construire la liste combinée et les index source/dest
-            if ci == cj:
-                combined = src_coords
-                src_idx = list(range(len(combined)))
-                dst_idx = list(range(len(combined)))
-            else:
-                combined = src_coords + dst_coords
-                ns = len(src_coords)
-                src_idx = list(range(ns))
-                dst_idx = list(range(ns, ns + len(dst_coords)))
+    batches: list[tuple[np.ndarray, np.ndarray]] = []
+    for rows, cols in blocks:
+        square = symmetric and np.array_equal(rows, cols)
+        for ri in range(0, len(rows), B):
+            for cj in range(0, len(cols), B):
+                if square and cj < ri:
+                    continue
+                batches.append((rows[ri:ri + B], cols[cj:cj + B]))
+
+    fetched = np.zeros(matrix.shape, dtype=bool)
+    total_calls = len(batches)
+    if total_calls == 0:
+        return fetched
 
+    bucket = _TokenBucket(rps, burst=rps)
+
+    def run(src: np.ndarray, dst: np.ndarray) -> None:
+        # Construire la liste combinée et les index source/dest
+        if np.array_equal(src, dst):
+            combined = [coords[i] for i in src]
+            src_idx = list(range(len(combined)))
+            dst_idx = list(range(len(combined)))
+        else:
+            combined = [coords[i] for i in src] + [coords[j] for j in dst]
+            ns = len(src)
+            src_idx = list(range(ns))
+            dst_idx = list(range(ns, ns + len(dst)))
+
+        bucket.acquire()
+        block = _durations_block(
+            _osrm_table(combined, src_idx, dst_idx, profile=profile),
+            (len(src), len(dst)),
+        )
+        cells = _block_index(src, dst)
+        matrix[cells] = block
+        fetched[cells] = True
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(run, src, dst): (src, dst) for src, dst in batches}
+        for call, fut in enumerate(as_completed(futures), start=1):
             try:
-                data = _osrm_table(combined, src_idx, dst_idx, profile=profile)
-                durations = data.get("durations", [])
-                for r, row_vals in enumerate(durations):
-                    for c, val in enumerate(row_vals):
-                        if val is not None:
-                            matrix[si + r, sj + c] = val
+                fut.result()
             except Exception as exc:
+                src, dst = futures[fut]
                 print(
-                    f"    [warn] OSRM batch src=[{si}:{ei}] dst=[{sj}:{ej}] "
+                    f"    [warn] OSRM batch src={len(src)} sites dst={len(dst)} sites "
                     f"échoué : {exc}",
                     file=sys.stderr,
                 )
-
-            call += 1
             if call % 5 == 0 or call == total_calls:
                 print(f"    OSRM [{call}/{total_calls}] batches")
-            time.sleep(OSRM_SLEEP)
 
-    # Diagonale = 0
-    np.fill_diagonal(matrix, 0.0)
+    return fetched
+
+
+class _TokenBucket:
+    """
+    Limiteur de débit partagé entre threads (token bucket).
+    rate : jetons/s ; burst : nombre max de jetons accumulés.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloque jusqu'à disposer d'un jeton."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def measure_asymmetry(matrix: np.ndarray, mask: np.ndarray | None = None) -> dict:
+    """
+    Mesure l'asymétrie relative |d(i,j) − d(j,i)| / moyenne sur les paires
+    dont les deux sens sont connus (mask & mask.T, hors diagonale et hors
+    routes introuvables).
+
+    Retourne {"pairs", "median", "p95", "max"} (ratios, 0.05 = 5 %).
+    """
+    n = len(matrix)
+    known = np.ones((n, n), dtype=bool) if mask is None else mask
+    sample = known & known.T & (matrix < LARGE_DURATION) & (matrix.T < LARGE_DURATION)
+    sample &= np.triu(np.ones((n, n), dtype=bool), k=1)
+
+    a = matrix[sample].astype(float)
+    b = matrix.T[sample].astype(float)
+    if a.size == 0:
+        return {"pairs": 0, "median": None, "p95": None, "max": None}
+
+    rel = np.abs(a - b) / np.maximum((a + b) / 2, 1.0)
+    return {
+        "pairs": int(a.size),
+        "median": round(float(np.median(rel)), 4),
+        "p95": round(float(np.percentile(rel, 95)), 4),
+        "max": round(float(rel.max()), 4),
+    }
+
+
+def _cover_blocks(missing: np.ndarray) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Blocs S × tout + (reste) × S couvrant toutes les paires manquantes."""
+    n = len(missing)
+    cover = _missing_cover(missing)
+    rest = np.setdiff1d(np.arange(n), cover)
+    blocks = [(cover, np.arange(n))]
+    if rest.size:
+        blocks.append((rest, cover))
+    return blocks
+
+
+def _fill_matrix(
+    coords: list[tuple[float, float]],
+    matrix: np.ndarray,
+    known: np.ndarray,
+    profile: str = DEFAULT_PROFILE,
+    use_cache: bool = True,
+    rps: float | None = None,
+    workers: int | None = None,
+    symmetric: bool = False,
+) -> None:
+    """
+    Complète en place les paires de `matrix` non marquées dans `known` :
+    matrices précalculées (phase 9), puis cache disque, puis OSRM pour le
+    reste. Voir compute_duration_matrix.
+    """
+    keys = [site_key(lat, lon) for lat, lon in coords]
+    known = known.copy()
+    np.fill_diagonal(known, True)
+    if known.all():
+        return
+
+    if use_cache:
+        # Matrices précalculées par zone (phase 9) : lookup en mémoire
+        values, found = get_matrix_store().lookup(profile, keys)
+        hit = found & ~known
+        if hit.any():
+            matrix[hit] = values[hit]
+            known |= hit
+            print(f"    [matrices] {int(hit.sum())} paires précalculées")
+            if known.all():
+                return
+
+    n_missing = int((~known).sum())
+    cache = get_duration_cache() if use_cache else None
+
+    if cache is not None:
+        for rows, cols in _cover_blocks(~known):
+            values, found = cache.lookup(
+                profile, [keys[i] for i in rows], [keys[j] for j in cols],
+            )
+            cells = np.ix_(rows, cols)
+            hit = found & ~known[cells]
+            block = matrix[cells]
+            block[hit] = values[hit]
+            matrix[cells] = block
+            known[cells] |= hit
+        if symmetric:
+            reverse = ~known & known.T
+            matrix[reverse] = matrix.T[reverse]
+            known |= reverse
+        n_hit = n_missing - int((~known).sum())
+        print(f"    [cache] OSRM : {n_hit}/{n_missing} paires en cache")
+
+    missing = ~known
+    if not missing.any():
+        return
+
+    # S × tout  +  (reste) × S  couvre toutes les paires manquantes
+    # (en mode symétrique, (reste) × S s'obtient par miroir)
+    blocks = _cover_blocks(missing)
+    if symmetric:
+        blocks = blocks[:1]
+
+    fetched = _fetch_blocks(
+        coords, blocks, matrix, profile=profile,
+        rps=rps or OSRM_RPS, workers=workers or OSRM_WORKERS,
+        symmetric=symmetric,
+    )
+    if cache is not None:
+        cache.store(profile, keys, matrix, fetched & missing)
+
+    if symmetric:
+        asym = measure_asymmetry(matrix, fetched)
+        if asym["pairs"]:
+            print(
+                f"    [sym] asymétrie mesurée sur {asym['pairs']} paires : "
+                f"médiane {100 * asym['median']:.1f}%  "
+                f"p95 {100 * asym['p95']:.1f}%  max {100 * asym['max']:.1f}%"
+            )
+            if asym["p95"] > SYMMETRY_WARN:
+                print(
+                    f"    [warn] asymétrie p95 > {100 * SYMMETRY_WARN:.0f}% : "
+                    f"le mode symétrique est approximatif pour ce profil",
+                    file=sys.stderr,
+                )
+        else:
+            print("    [sym] échantillon insuffisant pour mesurer l'asymétrie")
+
+        # Recopie en miroir des paires non reçues dont l'inverse est connu
+        known |= fetched
+        mirror = ~known & known.T
+        matrix[mirror] = matrix.T[mirror]
 
-    # Stats qualité
+
+def _warn_unreachable(matrix: np.ndarray) -> None:
+    """Stats qualité : signale une proportion élevée de paires non-routables."""
+    n = len(matrix)
     unreachable = (matrix == LARGE_DURATION).sum() - n  # exclure diag
     total_pairs = n * n - n
     if total_pairs > 0 and unreachable / total_pairs > 0.1:
@@ -159,18 +406,369 @@ def compute_duration_matrix(
             file=sys.stderr,
         )
 
+
+def compute_duration_matrix(
+    coords: list[tuple[float, float]],
+    profile: str = DEFAULT_PROFILE,
+    use_cache: bool = True,
+    rps: float | None = None,
+    workers: int | None = None,
+    symmetric: bool = False,
+) -> np.ndarray:
+    """
+    Calcule la matrice NxN de durées de trajet (secondes) via OSRM Table.
+    Gère le batching pour les grands jeux de coordonnées.
+
+    use_cache=True : les paires déjà connues sont lues dans les matrices
+    précalculées (phase 9) puis dans le cache disque (osrm_cache) ; seules les
+    lignes/colonnes manquantes sont demandées à OSRM, puis les nouvelles
+    paires sont enregistrées. use_cache=False : tout est demandé à OSRM.
+
+    rps / workers : budget requêtes/s et parallélisme des lots OSRM
+    (défauts : OSRM_RPS / OSRM_WORKERS).
+
+    symmetric=True : suppose d(i,j) ≈ d(j,i) (profil foot) — seuls les blocs
+    du triangle supérieur sont demandés puis recopiés en miroir, soit environ
+    deux fois moins d'appels OSRM. L'asymétrie réelle est mesurée sur les
+    blocs diagonaux (reçus dans les deux sens) et affichée pour contrôle.
+
+    Retourne un np.ndarray (N, N) de secondes entières (DURATION_DTYPE).
+    Les routes introuvables valent LARGE_DURATION.
+    """
+    n = len(coords)
+    if n == 0:
+        return np.zeros((1, 0), dtype=DURATION_DTYPE)
+    if n == 1:
+        return np.zeros((1, 1), dtype=DURATION_DTYPE)
+
+    matrix = np.full((n, n), LARGE_DURATION, dtype=DURATION_DTYPE)
+    _fill_matrix(
+        coords, matrix, np.zeros((n, n), dtype=bool), profile=profile,
+        use_cache=use_cache, rps=rps, workers=workers, symmetric=symmetric,
+    )
+
+    # Diagonale = 0
+    np.fill_diagonal(matrix, 0)
+
+    _warn_unreachable(matrix)
     return matrix
 
 
+class DurationMatrix:
+    """
+    Matrice de durées indexée par identité de site (site_key), modifiable
+    incrémentalement :
+      - add()  : ajoute des sites → seules les lignes/colonnes nouvelles
+                 (1×N + N×1 par site) sont demandées au cache puis à OSRM
+      - drop() : retire des sites sans aucun appel
+      - matrix_for() : sous-matrice dans l'ordre de coords (ajoute au besoin)
+
+    Sert à réutiliser la matrice d'une zone entre deux /api/generate
+    (sites visités exclus, point de départ ajouté…).
+    """
+
+    def __init__(self, profile: str = DEFAULT_PROFILE, symmetric: bool = False):
+        self.profile = profile
+        self.symmetric = symmetric
+        self.keys: list[str] = []
+        self.coords: list[tuple[float, float]] = []
+        self.values = np.zeros((0, 0), dtype=DURATION_DTYPE)
+        self._index: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def add(self, coords: list[tuple[float, float]]) -> int:
+        """Ajoute les sites absents. Retourne le nombre de sites ajoutés."""
+        with self._lock:
+            return self._add(coords)
+
+    def _add(self, coords: list[tuple[float, float]]) -> int:
+        new_coords: list[tuple[float, float]] = []
+        new_keys: list[str] = []
+        for lat, lon in coords:
+            key = site_key(lat, lon)
+            if key not in self._index and key not in new_keys:
+                new_keys.append(key)
+                new_coords.append((lat, lon))
+        if not new_keys:
+            return 0
+
+        n_old = len(self.keys)
+        n = n_old + len(new_keys)
+        values = np.full((n, n), LARGE_DURATION, dtype=DURATION_DTYPE)
+        values[:n_old, :n_old] = self.values
+        known = np.zeros((n, n), dtype=bool)
+        known[:n_old, :n_old] = True
+
+        all_coords = self.coords + new_coords
+        _fill_matrix(
+            all_coords, values, known,
+            profile=self.profile, symmetric=self.symmetric,
+        )
+        np.fill_diagonal(values, 0)
+
+        self.values = values
+        self.coords = all_coords
+        self.keys = self.keys + new_keys
+        self._index = {k: i for i, k in enumerate(self.keys)}
+        return len(new_keys)
+
+    def drop(self, keys) -> int:
+        """Retire les sites donnés (clés absentes ignorées). Retourne le nombre retiré."""
+        with self._lock:
+            return self._drop(keys)
+
+    def _drop(self, keys) -> int:
+        drop = {k for k in keys if k in self._index}
+        if not drop:
+            return 0
+        keep = [i for i, k in enumerate(self.keys) if k not in drop]
+        self.values = self.values[np.ix_(keep, keep)]
+        self.coords = [self.coords[i] for i in keep]
+        self.keys = [self.keys[i] for i in keep]
+        self._index = {k: i for i, k in enumerate(self.keys)}
+        return len(drop)
+
+    def matrix_for(
+        self,
+        coords: list[tuple[float, float]],
+        max_sites: int | None = None,
+    ) -> np.ndarray:
+        """
+        Sous-matrice (N, N) dans l'ordre de coords ; ajoute les sites manquants.
+
+        Ajout, extraction (copie) et élagage se font sous un même verrou :
+        une requête concurrente ne peut pas retirer un site entre l'ajout et
+        l'extraction. Au-delà de max_sites, les sites absents de coords sont
+        retirés — la sous-matrice déjà extraite n'en dépend plus.
+        """
+        with self._lock:
+            self._add(coords)
+            requested = [site_key(lat, lon) for lat, lon in coords]
+            idx = [self._index[k] for k in requested]
+            matrix = self.values[np.ix_(idx, idx)]
+            if max_sites is not None and len(self.keys) > max_sites:
+                wanted = set(requested)
+                self._drop([k for k in self.keys if k not in wanted])
+        _warn_unreachable(matrix)
+        return matrix
+
+
 # ═══════════════════════════════════════════════════════════════════════
 #  TSP (OR-Tools)
 # ═══════════════════════════════════════════════════════════════════════
 
+# ── Budget temps adaptatif ──────────────────────────────────────────
+TSP_MIN_LIMIT = 0.5          # secondes, plancher du budget
+TSP_SECONDS_PER_SITE = 0.1   # budget ≈ 0.1 s par site (300 sites → 30 s)
+TSP_STALL_RATIO = 0.2        # arrêt si aucune amélioration pendant 20 % du budget…
+TSP_MIN_STALL = 0.2          # … et au moins 0.2 s
+TSP_WARM_STALL_RATIO = 0.05  # départ à chaud : solution déjà proche, fenêtre 4× plus courte
+TSP_FLOOR_RATIO = 0.1        # heuristique NumPy (plancher de l'arrêt anticipé) : 10 % du budget
+
+# Portefeuille multi-départ (solve_tsp_parallel) : (construction, métaheuristique)
+# par ordre de priorité — les N premiers sont lancés avec N workers.
+TSP_PORTFOLIO = (
+    ("PATH_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH"),
+    ("SAVINGS", "GUIDED_LOCAL_SEARCH"),
+    ("LOCAL_CHEAPEST_INSERTION", "GUIDED_LOCAL_SEARCH"),
+    ("PATH_CHEAPEST_ARC", "SIMULATED_ANNEALING"),
+    ("CHRISTOFIDES", "GUIDED_LOCAL_SEARCH"),
+    ("PATH_CHEAPEST_ARC", "TABU_SEARCH"),
+    ("GLOBAL_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH"),
+    ("PARALLEL_CHEAPEST_INSERTION", "GUIDED_LOCAL_SEARCH"),
+    ("SAVINGS", "SIMULATED_ANNEALING"),
+    ("FIRST_UNBOUND_MIN_VALUE", "GUIDED_LOCAL_SEARCH"),
+    ("CHRISTOFIDES", "TABU_SEARCH"),
+    ("LOCAL_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH"),
+    ("SAVINGS", "TABU_SEARCH"),
+    ("LOCAL_CHEAPEST_INSERTION", "SIMULATED_ANNEALING"),
+    ("GLOBAL_CHEAPEST_ARC", "TABU_SEARCH"),
+    ("PATH_MOST_CONSTRAINED_ARC", "GUIDED_LOCAL_SEARCH"),
+)
+TSP_WORKERS = int(os.environ.get("TSP_WORKERS", 1))
+
+
+def tsp_time_budget(n: int, time_limit: float | None = None) -> float:
+    """Budget (s) du solveur selon la taille ; time_limit sert de plafond."""
+    budget = max(TSP_MIN_LIMIT, TSP_SECONDS_PER_SITE * n)
+    if time_limit is not None:
+        budget = min(budget, float(time_limit))
+    return budget
+
+
+class _ConvergenceMonitor:
+    """
+    Callback OR-Tools appelé à chaque solution : enregistre la trace
+    (objectif vs temps) et interrompt la recherche quand les améliorations
+    stagnent depuis `stall_s` secondes — seulement une fois l'objectif
+    `floor` atteint (coût de l'heuristique NumPy), s'il est fourni.
+    """
+
+    def __init__(self, routing: pywrapcp.RoutingModel, stall_s: float, floor: float | None = None):
+        self.routing = routing
+        self.stall_s = stall_s
+        self.floor = floor
+        self.t0 = time.monotonic()
+        self.best: int | None = None
+        self.last_improvement = self.t0
+        self.trace: list[dict] = []
+        self.stopped_early = False
+
+    def __call__(self) -> None:
+        now = time.monotonic()
+        value = self.routing.CostVar().Max()
+        if self.best is None or value < self.best:
+            self.best = value
+            self.last_improvement = now
+            self.trace.append({"t": round(now - self.t0, 3), "objective": int(value)})
+        elif now - self.last_improvement > self.stall_s and (
+            self.floor is None or self.best <= self.floor
+        ):
+            self.stopped_early = True
+            self.routing.solver().FinishCurrentSearch()
+
+
+def _routing_model(
+    ext: np.ndarray,
+    depot: int,
+    n_vehicles: int = 1,
+) -> tuple[pywrapcp.RoutingIndexManager, pywrapcp.RoutingModel, int]:
+    """
+    Crée le modèle OR-Tools dont le coût d'arc est la matrice `ext`.
+
+    La matrice est enregistrée nativement (RegisterTransitMatrix) : la
+    recherche locale lit les coûts côté C++ sans jamais rappeler Python.
+    Retourne (manager, routing, transit_index) — transit_index sert aussi
+    aux dimensions (temps cumulé, budget…).
+    """
+    manager = pywrapcp.RoutingIndexManager(len(ext), n_vehicles, depot)
+    routing = pywrapcp.RoutingModel(manager)
+    transit = routing.RegisterTransitMatrix(ext.astype(np.int64).tolist())
+    routing.SetArcCostEvaluatorOfAllVehicles(transit)
+    return manager, routing, transit
+
+
+def _search(
+    routing: pywrapcp.RoutingModel,
+    n: int,
+    time_limit: float | None = None,
+    trace: list[dict] | None = None,
+    label: str = "TSP",
+    initial: list[list[int]] | None = None,
+    first_solution: str = "PATH_CHEAPEST_ARC",
+    metaheuristic: str = "GUIDED_LOCAL_SEARCH",
+    early_stop: bool = True,
+    floor: float | None = None,
+):
+    """
+    Lance la recherche OR-Tools (par défaut PATH_CHEAPEST_ARC + guided
+    local search) avec le budget adaptatif et l'arrêt sur stagnation.
+    first_solution / metaheuristic : noms des énumérations OR-Tools.
+    early_stop=False : pas d'arrêt sur stagnation, tout le budget est utilisé.
+    floor : objectif à atteindre avant tout arrêt sur stagnation.
+
+    initial : routes de départ (indices OR-Tools, un itinéraire par
+    véhicule, dépôts exclus) — la construction est sautée et la recherche
+    locale repart de cette solution.
+    Retourne l'assignation (None si aucune solution).
+    """
+    params = pywrapcp.DefaultRoutingSearchParameters()
+    params.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy, first_solution,
+    )
+    params.local_search_metaheuristic = getattr(
+        routing_enums_pb2.LocalSearchMetaheuristic, metaheuristic,
+    )
+    budget = tsp_time_budget(n, time_limit)
+    params.time_limit.FromMilliseconds(int(budget * 1000))
+
+    stall_ratio = TSP_WARM_STALL_RATIO if initial is not None else TSP_STALL_RATIO
+    stall_s = max(TSP_MIN_STALL, stall_ratio * budget) if early_stop else float("inf")
+    monitor = _ConvergenceMonitor(routing, stall_s=stall_s, floor=floor)
+    routing.AddAtSolutionCallback(monitor)
+
+    assignment = None
+    if initial is not None:
+        routing.CloseModelWithParameters(params)
+        assignment = routing.ReadAssignmentFromRoutes(initial, True)
+        if assignment is None:
+            print("    [warn] route initiale rejetée par OR-Tools, construction standard.", file=sys.stderr)
+    if assignment is not None:
+        solution = routing.SolveFromAssignmentWithParameters(assignment, params)
+    else:
+        solution = routing.SolveWithParameters(params)
+
+    elapsed = time.monotonic() - monitor.t0
+    print(
+        f"    {label} : {len(monitor.trace)} améliorations en {elapsed:.2f}s "
+        f"(budget {budget:.1f}s{', convergé' if monitor.stopped_early else ''}"
+        f"{', départ à chaud' if assignment is not None else ''})"
+    )
+    if trace is not None:
+        trace.extend(monitor.trace)
+    return solution
+
+
+def _complete_route(ext: np.ndarray, depot: int, route: list[int]) -> list[int]:
+    """
+    Route initiale valide pour la matrice `ext` : indices hors bornes,
+    doublons et dépôt retirés, puis sites manquants insérés un à un à la
+    position la moins coûteuse (insertion cheapest).
+    """
+    n = len(ext)
+    seen: set[int] = {depot}
+    tour = [depot]
+    for node in route:
+        if 0 <= node < n and node not in seen:
+            seen.add(node)
+            tour.append(node)
+
+    for node in range(n):
+        if node in seen:
+            continue
+        t = np.asarray(tour)
+        nxt = np.roll(t, -1)
+        delta = ext[t, node].astype(np.int64) + ext[node, nxt] - ext[t, nxt]
+        pos = int(np.argmin(delta)) + 1
+        tour.insert(pos, node)
+        seen.add(node)
+    return tour[1:]
+
+
+def _solve_numpy(
+    ext: np.ndarray,
+    depot: int,
+    time_limit: float | None = None,
+    trace: list[dict] | None = None,
+    initial: list[int] | None = None,
+) -> tuple[list[int], float]:
+    """Moteur heuristique NumPy sur la matrice étendue (dépôt exclu de la route)."""
+    t0 = time.monotonic()
+    tour, total = heuristics.solve(
+        ext, depot, time_limit=time_limit, trace=trace,
+        initial=[depot] + initial if initial is not None else None,
+    )
+    print(f"    TSP (numpy) : {1000 * (time.monotonic() - t0):.0f} ms")
+    return [node for node in tour if node != depot], total
+
+
 def solve_tsp(
     matrix: np.ndarray,
     open_path: bool = True,
-    time_limit: int = 30,
+    time_limit: float | None = 30,
     start_index: int | None = None,
+    trace: list[dict] | None = None,
+    engine: str = "ortools",
+    initial_route: list[int] | None = None,
+    first_solution: str = "PATH_CHEAPEST_ARC",
+    metaheuristic: str = "GUIDED_LOCAL_SEARCH",
+    early_stop: bool = True,
 ) -> tuple[list[int], float]:
     """
     Résout le TSP sur la matrice de durées.
@@ -178,60 +776,95 @@ def solve_tsp(
     open_path=True  → pas de retour au point de départ (dummy depot)
     open_path=False → boucle fermée
     start_index     → force le départ à cet index (None = auto)
+    time_limit      → plafond (s) ; le budget effectif dépend de N
+                      (tsp_time_budget) et la recherche s'arrête dès que
+                      les améliorations stagnent
+    trace           → liste complétée avec {"t", "objective"} à chaque
+                      amélioration (courbe de convergence)
+    engine          → "ortools" (GUIDED_LOCAL_SEARCH) ou "numpy" (plus proche
+                      voisin + 2-opt + Or-opt, < 100 ms : aperçus interactifs)
+    initial_route   → départ à chaud : ordre de visite d'une solution
+                      précédente (mêmes indices que matrix) ; les sites
+                      disparus sont ignorés, les nouveaux insérés au
+                      meilleur endroit avant la recherche locale
+    first_solution, metaheuristic → stratégies OR-Tools (voir TSP_PORTFOLIO)
+    early_stop      → False : ignore la stagnation et utilise tout le budget ;
+                      True : l'heuristique NumPy sert de plancher (pas
+                      d'arrêt avant de l'avoir égalée, sa route est
+                      retournée si OR-Tools ne fait pas mieux)
 
     Retourne (route, total_duration_seconds).
     route : liste d'indices 0-based dans l'ordre de visite.
     """
     n = len(matrix)
-    if n <= 1:
-        return list(range(n)), 0.0
-    if n == 2:
-        return [0, 1], float(matrix[0, 1])
+    if n <= 2:
+        # Cas triviaux, mêmes conventions que la suite : dépôt réel exclu
+        if open_path and start_index is None:
+            if n == 2 and matrix[1, 0] < matrix[0, 1]:
+                return [1, 0], float(matrix[1, 0])
+            return list(range(n)), float(matrix[0, 1]) if n == 2 else 0.0
+        depot = start_index if start_index is not None else 0
+        route = [i for i in range(n) if i != depot]
+        if not route:
+            return [], 0.0
+        total = int(matrix[depot, route[0]])
+        if not open_path:
+            total += int(matrix[route[0], depot])
+        return route, float(total)
 
     # ── Construction de la matrice étendue (dummy depot si open) ─────
     if open_path and start_index is None:
         # Chemin ouvert sans point de départ forcé → dummy depot
-        ext = np.zeros((n + 1, n + 1))
+        ext = np.zeros((n + 1, n + 1), dtype=matrix.dtype)
         ext[:n, :n] = matrix
         depot = n
-        size = n + 1
     elif open_path and start_index is not None:
         # Chemin ouvert avec point de départ forcé → utiliser start_index comme depot
         ext = matrix
         depot = start_index
-        size = n
     else:
         # Boucle fermée → utiliser start_index ou 0 comme depot
         ext = matrix
         depot = start_index if start_index is not None else 0
-        size = n
 
-    # ── OR-Tools ─────────────────────────────────────────────────────
-    manager = pywrapcp.RoutingIndexManager(size, 1, depot)
-    routing = pywrapcp.RoutingModel(manager)
+    initial = None
+    if initial_route is not None:
+        initial = _complete_route(ext, depot, list(initial_route))
 
-    def dist_cb(from_idx, to_idx):
-        a = manager.IndexToNode(from_idx)
-        b = manager.IndexToNode(to_idx)
-        return int(ext[a][b])
+    if engine == "numpy":
+        return _solve_numpy(ext, depot, time_limit, trace, initial)
 
-    cb_index = routing.RegisterTransitCallback(dist_cb)
-    routing.SetArcCostEvaluatorOfAllVehicles(cb_index)
+    # ── Plancher : heuristique NumPy (quelques ms) ───────────────────
+    # L'arrêt sur stagnation peut couper GLS sur un plateau moins bon que
+    # 2-opt + Or-opt : pas d'arrêt tant que ce coût n'est pas atteint.
+    # Son temps est pris sur le budget : OR-Tools reçoit le reste.
+    floor_route, floor_total = None, None
+    search_limit = time_limit
+    if early_stop:
+        budget = tsp_time_budget(n, time_limit)
+        t_floor = time.monotonic()
+        floor_route, floor_total = _solve_numpy(
+            ext.astype(np.int64), depot,
+            time_limit=TSP_FLOOR_RATIO * budget, initial=initial,
+        )
+        search_limit = max(0.01, budget - (time.monotonic() - t_floor))
 
-    params = pywrapcp.DefaultRoutingSearchParameters()
-    params.first_solution_strategy = (
-        routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
-    )
-    params.local_search_metaheuristic = (
-        routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+    # ── OR-Tools ─────────────────────────────────────────────────────
+    manager, routing, _ = _routing_model(ext, depot)
+    solution = _search(
+        routing, n, search_limit, trace,
+        initial=[[manager.NodeToIndex(i) for i in initial]] if initial is not None else None,
+        first_solution=first_solution,
+        metaheuristic=metaheuristic,
+        early_stop=early_stop,
+        floor=floor_total,
     )
-    params.time_limit.seconds = time_limit
-
-    solution = routing.SolveWithParameters(params)
 
     if not solution:
-        print("    [warn] OR-Tools : pas de solution trouvée, fallback nearest-neighbor.")
-        return list(range(n)), 0.0
+        print("    [warn] OR-Tools : pas de solution trouvée, fallback heuristique NumPy.")
+        if floor_route is not None:
+            return floor_route, floor_total
+        return _solve_numpy(ext, depot, time_limit, trace)
 
     # ── Extraction de la route ───────────────────────────────────────
     route: list[int] = []
@@ -243,80 +876,468 @@ def solve_tsp(
         idx = solution.Value(routing.NextVar(idx))
 
     total = float(solution.ObjectiveValue())
+    if floor_total is not None and floor_total < total:
+        print(f"    TSP : heuristique NumPy retenue ({floor_total:.0f} < {total:.0f})")
+        return floor_route, floor_total
     return route, total
 
 
+def _portfolio_worker(
+    shm_name: str,
+    shape: tuple[int, int],
+    dtype: str,
+    deadline: float,
+    kwargs: dict,
+) -> tuple[list[int], float, list[dict]]:
+    """
+    Processus du portefeuille : lit la matrice en mémoire partagée (sans
+    copie) et résout jusqu'à `deadline` (time.time()) — le démarrage du
+    processus est décompté du budget.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    matrix = None
+    try:
+        matrix = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        trace: list[dict] = []
+        time_limit = max(TSP_MIN_LIMIT, deadline - time.time())
+        route, total = solve_tsp(matrix, trace=trace, time_limit=time_limit, **kwargs)
+        return route, total, trace
+    finally:
+        matrix = None  # libérer la vue avant close()
+        shm.close()
+
+
+def solve_tsp_parallel(
+    matrix: np.ndarray,
+    open_path: bool = True,
+    time_limit: float | None = 30,
+    start_index: int | None = None,
+    trace: list[dict] | None = None,
+    workers: int | None = None,
+    initial_route: list[int] | None = None,
+) -> tuple[list[int], float]:
+    """
+    TSP multi-départ : les `workers` premières stratégies de TSP_PORTFOLIO
+    tournent en parallèle (un processus chacune, tout le budget, sans arrêt
+    sur stagnation), la meilleure tournée est retenue. Même retour que
+    solve_tsp.
+
+    La matrice est placée une fois en mémoire partagée : les workers la
+    lisent directement au lieu d'en recevoir une copie sérialisée.
+    """
+    workers = min(workers or TSP_WORKERS, len(TSP_PORTFOLIO))
+    kwargs = dict(open_path=open_path, start_index=start_index, initial_route=initial_route)
+    if workers <= 1 or len(matrix) <= 3:
+        return solve_tsp(matrix, trace=trace, time_limit=time_limit, **kwargs)
+
+    deadline = time.time() + tsp_time_budget(len(matrix), time_limit)
+
+    matrix = np.ascontiguousarray(matrix)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+    try:
+        np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shm.buf)[:] = matrix
+        # spawn : pas de fork d'un processus multi-thread (Flask, pool OSRM)
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = {
+                pool.submit(
+                    _portfolio_worker, shm.name, matrix.shape, matrix.dtype.str, deadline,
+                    dict(kwargs, first_solution=first, metaheuristic=meta, early_stop=False),
+                ): f"{first}+{meta}"
+                for first, meta in TSP_PORTFOLIO[:workers]
+            }
+            results = []
+            for fut in as_completed(futures):
+                try:
+                    route, total, worker_trace = fut.result()
+                except Exception as exc:
+                    print(f"    [warn] TSP {futures[fut]} : {exc}", file=sys.stderr)
+                    continue
+                print(f"    TSP {futures[fut]} : {total / 60:.0f} min")
+                results.append((total, futures[fut], route, worker_trace))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if not results:
+        print("    [warn] portefeuille TSP sans résultat, résolution séquentielle.", file=sys.stderr)
+        return solve_tsp(matrix, trace=trace, time_limit=time_limit, **kwargs)
+
+    total, label, route, worker_trace = min(results, key=lambda r: r[0])
+    print(f"    TSP multi-départ : meilleure stratégie {label} ({len(results)}/{workers} workers)")
+    if trace is not None:
+        trace.extend(worker_trace)
+    return route, total
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  Planification multi-jours (une tournée par jour, budget horaire)
+# ═══════════════════════════════════════════════════════════════════════
+
+DAY_BUDGET_S = 7 * 3600        # durée max d'une journée (trajets + visites)
+DAY_START_S = 8 * 3600 + 30 * 60   # heure de départ (s depuis minuit) : 8h30
+DAY_HORIZON_S = 24 * 3600      # horloge de la dimension « Time »
+SERVICE_BASE_S = 10 * 60       # temps de visite fixe par site…
+SERVICE_PER_ORTHO_S = 5 * 60   # … plus ce temps par orthophoniste du site
+DROP_PENALTY = 10 * LARGE_DURATION  # coût d'un site non planifié (> tout détour)
+
+
+def service_times(
+    nb_orthos,
+    base_s: int = SERVICE_BASE_S,
+    per_ortho_s: int = SERVICE_PER_ORTHO_S,
+) -> np.ndarray:
+    """Temps de visite (s) de chaque site : base + per_ortho × nb_orthos."""
+    n = np.nan_to_num(np.asarray(nb_orthos, dtype=float))
+    return np.rint(base_s + per_ortho_s * n).astype(np.int64)
+
+
+def check_time_windows(
+    ext: np.ndarray,
+    depot: int,
+    windows: np.ndarray,
+    service: np.ndarray,
+    day_start_s: int = DAY_START_S,
+    day_budget_s: int = DAY_BUDGET_S,
+) -> np.ndarray:
+    """
+    Pré-contrôle vectorisé, avant toute résolution : masque des sites
+    impossibles à visiter même seuls dans leur journée — créneau vide,
+    créneau fermé à l'arrivée au plus tôt (départ + trajet direct), ou
+    journée dépassée en comptant attente, visite et retour.
+    windows : (N, 2) ouverture / fermeture en secondes depuis minuit.
+    """
+    arrival = day_start_s + ext[depot, :].astype(np.int64)
+    begin = np.maximum(arrival, windows[:, 0])
+    finish = begin + service
+    infeasible = finish > windows[:, 1]
+    infeasible |= finish + ext[:, depot] - day_start_s > day_budget_s
+    infeasible[depot] = False
+    return infeasible
+
+
+def plan_multi_day(
+    matrix: np.ndarray,
+    n_days: int,
+    day_budget_s: int = DAY_BUDGET_S,
+    service_s: np.ndarray | None = None,
+    open_path: bool = True,
+    start_index: int | None = None,
+    time_limit: float | None = 30,
+    trace: list[dict] | None = None,
+    windows: np.ndarray | None = None,
+    day_start_s: int = DAY_START_S,
+    prizes: np.ndarray | None = None,
+) -> tuple[list[dict], list[int]]:
+    """
+    Répartit les sites en n_days tournées (un véhicule OR-Tools par jour),
+    chacune plafonnée à day_budget_s secondes trajets + visites compris.
+
+    Dimension « Time » (heure de la journée, départ à day_start_s) :
+    transit(i→j) = service_s[i] + matrix[i, j], attente autorisée.
+    windows : créneaux d'ouverture optionnels, array (N, 2) en secondes
+    depuis minuit (NaN = pas de contrainte) ; la visite doit se terminer
+    avant la fermeture. Les sites impossibles (check_time_windows) sont
+    écartés sans être soumis au solveur ; avec créneaux, l'attente entre
+    dans l'objectif (coût de span).
+
+    Chaque site porte une disjonction (pénalité DROP_PENALTY) : si la
+    charge dépasse n_days × budget, les sites en trop sont écartés plutôt
+    que de rendre le problème infaisable.
+
+    prizes : mode « orienteering » — la pénalité d'un site devient son gain
+    (ex. nb_orthos), multiplié de sorte qu'une unité de gain l'emporte sur
+    tout trajet possible dans le budget : le solveur maximise le gain total
+    visité, puis minimise les trajets à gain égal.
+
+    Conventions de solve_tsp : chaque jour part de start_index (ou d'un
+    dépôt fictif en chemin ouvert, du site 0 en boucle fermée), qui
+    n'apparaît pas dans les routes ; en chemin ouvert le retour est gratuit.
+
+    Retourne (jours, sites_écartés) — jours[d] = {"route", "segments",
+    "arrivals", "travel_s", "service_s", "duration_s", "prize"} ; segments[i] =
+    trajet vers route[i] (0 pour le premier arrêt sans point de départ),
+    arrivals[i] = heure d'arrivée (s depuis minuit) en route[i].
+    """
+    n = len(matrix)
+    service = np.zeros(n, dtype=np.int64) if service_s is None else np.asarray(service_s, dtype=np.int64)
+
+    # ── Matrice étendue (mêmes conventions que solve_tsp) ────────────
+    if open_path and start_index is None:
+        ext = np.zeros((n + 1, n + 1), dtype=np.int64)
+        ext[:n, :n] = matrix
+        depot = n
+        service = np.append(service, 0)
+    else:
+        ext = np.asarray(matrix, dtype=np.int64).copy()
+        depot = start_index if start_index is not None else 0
+        if open_path:
+            ext[:, depot] = 0           # fin de journée libre
+    service = service.copy()
+    service[depot] = 0
+
+    tw = np.tile([0, DAY_HORIZON_S], (len(ext), 1))
+    if windows is not None:
+        given = np.asarray(windows, dtype=float)
+        tw[:n] = np.where(np.isnan(given), tw[:n], given).astype(np.int64)
+    tw[depot] = (0, DAY_HORIZON_S)
+
+    excluded = check_time_windows(ext, depot, tw, service, day_start_s, day_budget_s)
+    if excluded.any():
+        print(f"    [warn] {int(excluded.sum())} site(s) hors créneau ou hors budget, écartés d'office")
+
+    manager, routing, _ = _routing_model(ext, depot, n_vehicles=n_days)
+
+    time_cb = routing.RegisterTransitMatrix((ext + service[:, None]).tolist())
+    routing.AddDimension(time_cb, DAY_HORIZON_S, DAY_HORIZON_S, False, "Time")
+    time_dim = routing.GetDimensionOrDie("Time")
+    for v in range(n_days):
+        time_dim.CumulVar(routing.Start(v)).SetValue(int(day_start_s))
+        time_dim.SetSpanUpperBoundForVehicle(int(day_budget_s), v)
+    if windows is not None:
+        time_dim.SetSpanCostCoefficientForAllVehicles(1)
+
+    gain = np.zeros(len(ext), dtype=np.int64)
+    if prizes is not None:
+        gain[:n] = np.rint(np.nan_to_num(np.asarray(prizes, dtype=float)))
+        gain[depot] = 0
+        # arcs + span ≤ 2 × n_days × budget : une unité de gain pèse plus
+        penalties = gain * (2 * n_days * int(day_budget_s) + 1)
+    else:
+        penalties = np.full(len(ext), DROP_PENALTY, dtype=np.int64)
+
+    for node in range(len(ext)):
+        if node == depot:
+            continue
+        idx = manager.NodeToIndex(node)
+        if excluded[node]:
+            routing.solver().Add(routing.ActiveVar(idx) == 0)
+        else:
+            time_dim.CumulVar(idx).SetRange(int(tw[node, 0]), int(tw[node, 1] - service[node]))
+        routing.AddDisjunction([idx], int(penalties[node]))
+
+    if prizes is not None:
+        label = f"Orienteering {n_days} j"
+    else:
+        label = f"VRP {n_days} j" if n_days > 1 else "TSP créneaux"
+    solution = _search(routing, n, time_limit, trace, label=label)
+    if not solution:
+        print("    [warn] OR-Tools : pas de planning trouvé.", file=sys.stderr)
+        return [], [i for i in range(n) if i != depot]
+
+    # ── Extraction des tournées ──────────────────────────────────────
+    days: list[dict] = []
+    planned: set[int] = set()
+    for v in range(n_days):
+        route, segments, arrivals = [], [], []
+        prev = depot
+        idx = solution.Value(routing.NextVar(routing.Start(v)))
+        while not routing.IsEnd(idx):
+            node = manager.IndexToNode(idx)
+            route.append(node)
+            segments.append(int(ext[prev, node]))
+            arrivals.append(int(solution.Min(time_dim.CumulVar(idx))))
+            prev = node
+            idx = solution.Value(routing.NextVar(idx))
+        travel = sum(segments) + (int(ext[prev, depot]) if route else 0)
+        end = int(solution.Min(time_dim.CumulVar(routing.End(v))))
+        days.append({
+            "route": route,
+            "segments": segments,
+            "arrivals": arrivals,
+            "travel_s": travel,
+            "service_s": int(service[route].sum()) if route else 0,
+            "duration_s": end - int(day_start_s) if route else 0,
+            "prize": int(gain[route].sum()) if route else 0,
+        })
+        planned.update(route)
+
+    dropped = [i for i in range(n) if i != depot and i not in planned]
+    print(
+        f"    VRP : {sum(1 for d in days if d['route'])}/{n_days} jour(s) utilisés, "
+        f"{len(planned)} sites planifiés, {len(dropped)} écarté(s)"
+        + (f", gain {sum(d['prize'] for d in days)}/{int(gain.sum())}" if prizes is not None else "")
+    )
+    return days, dropped
+
+
 # ═══════════════════════════════════════════════════════════════════════
 #  Géométrie OSRM (tracé routier réel)
 # ═══════════════════════════════════════════════════════════════════════
 
+def _osrm_route_legs(
+    waypoints: list[tuple[float, float]],
+    profile: str = DEFAULT_PROFILE,
+) -> list[list[list[float]]]:
+    """
+    Appel à l'OSRM Route API sur une suite de waypoints (lat, lon).
+    Retourne le tracé [[lat, lon], …] de chaque tronçon (len(waypoints) − 1),
+    reconstitué à partir des polylines des étapes (steps).
+    """
+    base = OSRM_SERVERS.get(profile, OSRM_SERVERS["driving"])
+    coords_str = ";".join(f"{lon},{lat}" for lat, lon in waypoints)
+    params = {"steps": "true", "overview": "false", "geometries": "polyline"}
+    url = f"{base}/route/v1/{profile}/{coords_str}?{urlencode(params)}"
+
+    for attempt in range(OSRM_RETRIES):
+        try:
+            req = Request(url, headers={"User-Agent": "ortho-pipeline/1.0"})
+            with urlopen(req, timeout=OSRM_TIMEOUT) as resp:
+                data = json.loads(resp.read().decode("utf-8"))
+            break
+        except (HTTPError, URLError, TimeoutError, OSError) as exc:
+            if attempt >= OSRM_RETRIES - 1:
+                raise
+            wait = 2 ** (attempt + 1)
+            print(f"    [retry] OSRM route attempt {attempt+1} failed ({exc}), wait {wait}s", file=sys.stderr)
+            time.sleep(wait)
+
+    routes = data.get("routes") or []
+    if data.get("code") != "Ok" or not routes:
+        raise RuntimeError(f"OSRM error: {data.get('code')} – {data.get('message','')}")
+    legs = routes[0].get("legs", [])
+    if len(legs) != len(waypoints) - 1:
+        raise RuntimeError(f"OSRM : {len(legs)} tronçons reçus, {len(waypoints) - 1} attendus")
+
+    paths = []
+    for leg in legs:
+        path: list[list[float]] = []
+        for step in leg.get("steps", []):
+            points = decode_polyline(step.get("geometry", ""))
+            # Chaque étape reprend le dernier point de la précédente
+            path.extend(points[1:] if path and points and points[0] == path[-1] else points)
+        paths.append(path)
+    return paths
+
+
 def fetch_route_geometry(
     coords: list[tuple[float, float]],
     route_order: list[int],
     waypoints_per_call: int = 80,
     profile: str = DEFAULT_PROFILE,
+    rps: float = OSRM_RPS,
+    workers: int = OSRM_WORKERS,
 ) -> list[list[list[float]]]:
     """
     Récupère la géométrie routière exacte via l'API OSRM Route.
     Retourne une liste de segments, chaque segment = [[lat,lon], …].
+
+    Le tracé est assemblé tronçon par tronçon (site → site suivant) : les
+    tronçons présents dans le cache (polylines SQLite) ne sont pas
+    redemandés ; les suites de tronçons manquants sont découpées en appels
+    d'au plus waypoints_per_call waypoints, exécutés sur `workers` threads
+    limités à `rps` requêtes/s. Un tronçon en échec est tracé en ligne
+    droite (et n'est pas mis en cache).
     """
     ordered = [coords[i] for i in route_order]
-    n = len(ordered)
-    segments: list[list[list[float]]] = []
+    if len(ordered) < 2:
+        return []
+    keys = [site_key(lat, lon) for lat, lon in ordered]
+    pairs = list(zip(keys, keys[1:]))
 
-    for start in range(0, max(n - 1, 1), waypoints_per_call - 1):
-        end = min(start + waypoints_per_call, n)
-        batch = ordered[start:end]
-        if len(batch) < 2:
-            break
+    cache = get_duration_cache()
+    cached = cache.lookup_legs(profile, pairs) if cache is not None else {}
+    paths: list[list[list[float]] | None] = [
+        [] if a == b else (decode_polyline(cached[(a, b)]) if (a, b) in cached else None)
+        for a, b in pairs
+    ]
 
-        base = OSRM_SERVERS.get(profile, OSRM_SERVERS["driving"])
-        coords_str = ";".join(f"{lon},{lat}" for lat, lon in batch)
-        url = f"{base}/route/v1/{profile}/{coords_str}?overview=full&geometries=geojson"
+    # Suites contiguës de tronçons manquants, découpées par appel
+    max_legs = max(1, waypoints_per_call - 1)
+    calls: list[tuple[int, int]] = []
+    i = 0
+    while i < len(paths):
+        if paths[i] is not None:
+            i += 1
+            continue
+        j = i
+        while j < len(paths) and paths[j] is None and j - i < max_legs:
+            j += 1
+        calls.append((i, j))
+        i = j
 
-        try:
-            req = Request(url, headers={"User-Agent": "ortho-pipeline/1.0"})
-            with urlopen(req, timeout=OSRM_TIMEOUT) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
+    fetched: dict[tuple[str, str], str] = {}
+    failed = 0
+    if calls:
+        bucket = _TokenBucket(rps, burst=rps)
+
+        def run(first: int, last: int) -> list[list[list[float]]]:
+            bucket.acquire()
+            return _osrm_route_legs(ordered[first:last + 1], profile=profile)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(calls)))) as pool:
+            futures = {pool.submit(run, first, last): (first, last) for first, last in calls}
+            for future in as_completed(futures):
+                first, last = futures[future]
+                try:
+                    legs = future.result()
+                except Exception as exc:
+                    print(f"    [warn] OSRM route geometry : {exc}", file=sys.stderr)
+                    # Fallback lignes droites pour ces tronçons
+                    for k in range(first, last):
+                        paths[k] = [list(ordered[k]), list(ordered[k + 1])]
+                    failed += last - first
+                    continue
+                for k, path in zip(range(first, last), legs):
+                    paths[k] = path
+                    fetched[pairs[k]] = encode_polyline(path)
 
-            routes = data.get("routes", [])
-            if routes:
-                geom = routes[0]["geometry"]["coordinates"]
-                # GeoJSON [lon,lat] → Folium [lat,lon]
-                segment = [[lat, lon] for lon, lat in geom]
-                segments.append(segment)
-        except Exception as exc:
-            print(f"    [warn] OSRM route geometry : {exc}", file=sys.stderr)
-            # Fallback lignes droites pour ce segment
-            segment = [[lat, lon] for lat, lon in batch]
-            segments.append(segment)
+        if cache is not None and fetched:
+            cache.store_legs(profile, fetched)
 
-        time.sleep(OSRM_SLEEP)
+    print(
+        f"  [geometry] {len(pairs)} tronçons : {len(cached)} en cache, "
+        f"{len(fetched)} via OSRM ({len(calls)} appels)"
+        + (f", {failed} en ligne droite" if failed else "")
+    )
 
-    return segments
+    # Assemblage en un seul tracé continu
+    segment: list[list[float]] = []
+    for path in paths:
+        segment.extend(path[1:] if segment and path and path[0] == segment[-1] else path)
+    return [segment]
 
 
 # ═══════════════════════════════════════════════════════════════════════
 #  Construction de la solution route (DataFrame)
 # ═══════════════════════════════════════════════════════════════════════
 
+ROUTE_COLUMNS = [
+    "visit_order", "site_id", "geocoded_label", "latitude", "longitude", "nb_orthos",
+    "segment_s", "segment_min", "cumul_s", "cumul_min", "cumul_h",
+]
+MULTI_DAY_COLUMNS = ROUTE_COLUMNS + ["day", "arrival_s", "arrival"]
+
+
 def build_route_solution(
     df_routable: pd.DataFrame,
     route_order: list[int],
-    matrix: np.ndarray,
+    matrix: np.ndarray | None = None,
+    segments: list[int] | None = None,
 ) -> pd.DataFrame:
-    """Construit un DataFrame de la solution : ordre, durées, cumul."""
+    """
+    Construit un DataFrame de la solution : ordre, durées, cumul.
+    Les segments à LARGE_DURATION (route introuvable) sont signalés.
+
+    segments : durées déjà connues vers chaque arrêt (planification par
+    clusters, sans matrice NxN) — remplacent la lecture dans matrix.
+    """
     rows = []
-    cumul = 0.0
+    cumul = 0
+    unreachable = 0
 
     for order, idx in enumerate(route_order):
         site = df_routable.iloc[idx]
 
-        if order > 0:
-            seg = float(matrix[route_order[order - 1], idx])
-            cumul += seg
+        if segments is not None:
+            seg = int(segments[order]) if order > 0 else 0
+        elif order > 0:
+            seg = int(matrix[route_order[order - 1], idx])
         else:
-            seg = 0.0
+            seg = 0
+        if seg >= LARGE_DURATION:
+            unreachable += 1
+        cumul += seg
 
         rows.append({
             "visit_order": order + 1,
@@ -332,7 +1353,36 @@ def build_route_solution(
             "cumul_h": round(cumul / 3600, 2),
         })
 
-    return pd.DataFrame(rows)
+    if unreachable:
+        print(
+            f"    [warn] {unreachable} segment(s) sans route OSRM dans l'itinéraire",
+            file=sys.stderr,
+        )
+    return pd.DataFrame(rows, columns=ROUTE_COLUMNS)
+
+
+def build_multi_day_solution(
+    df_routable: pd.DataFrame,
+    days: list[dict],
+) -> pd.DataFrame:
+    """
+    Concatène les solutions journalières (plan_multi_day) : colonne `day`
+    (1..K), ordre de visite et cumul repartant de zéro chaque jour, heure
+    d'arrivée (`arrival_s` depuis minuit, `arrival` « HH:MM »).
+    Aucun site planifié : DataFrame vide, mêmes colonnes.
+    """
+    frames = [
+        build_route_solution(df_routable, d["route"], segments=d["segments"]).assign(
+            day=k + 1,
+            arrival_s=d["arrivals"],
+            arrival=[f"{a // 3600:02d}:{a % 3600 // 60:02d}" for a in d["arrivals"]],
+        )
+        for k, d in enumerate(days)
+        if d["route"]
+    ]
+    if not frames:
+        return pd.DataFrame(columns=MULTI_DAY_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
 
 
 def export_route(
@@ -9,6 +9,10 @@ Usage :
     python run_pipeline.py --phases all --dept 75            # département 75
     python run_pipeline.py --phases 1,2,3,4,5               # jusqu'à la carte
     python run_pipeline.py --phases all --tsp-limit 60       # TSP 60s
+    python run_pipeline.py --phases all --tsp-workers 16     # TSP multi-départ (16 cœurs)
+    python run_pipeline.py --phases all --dept 75015 --days 5  # 5 tournées journalières
+    python run_pipeline.py --phases all --city PARIS --prize --day-hours 4  # max d'orthos en 4 h
+    python run_pipeline.py --phases 9                       # matrices par CP (nocturne)
 """
 
 import argparse
@@ -26,16 +30,48 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--dept", type=str, default=None, help="Filtrer sur un département (CP)")
     p.add_argument(
         "--phases", type=str, default="1,2,3",
-        help="Phases à exécuter : 1,2,3,4,5,6,7,8 ou 'all'",
+        help="Phases à exécuter : 1,2,3,4,5,6,7,8,9 ou 'all' (1-8)",
+    )
+    p.add_argument(
+        "--geocode-mode", choices=("auto", "bulk", "single"), default="auto",
+        help="Géocodage : envoi CSV groupé, requêtes unitaires, ou auto selon le volume (défaut)",
     )
     p.add_argument(
         "--tsp-limit", type=int, default=30,
         help="Temps max en secondes pour le solveur TSP (défaut: 30)",
     )
+    p.add_argument(
+        "--tsp-engine", choices=("ortools", "numpy"), default="ortools",
+        help="Moteur TSP : OR-Tools (défaut) ou heuristique NumPy rapide",
+    )
+    p.add_argument(
+        "--prize", action="store_true",
+        help="Orienteering : maximiser les orthophonistes visités dans --day-hours",
+    )
+    p.add_argument(
+        "--tsp-workers", type=int, default=1,
+        help="Processus du TSP multi-départ (stratégies OR-Tools en parallèle, défaut: 1)",
+    )
     p.add_argument(
         "--closed-loop", action="store_true",
         help="TSP en boucle fermée (retour au point de départ)",
     )
+    p.add_argument(
+        "--symmetric", action="store_true",
+        help="Matrice OSRM symétrique : triangle supérieur + miroir (≈ 2× moins d'appels)",
+    )
+    p.add_argument(
+        "--days", type=int, default=1,
+        help="Nombre de tournées journalières (VRP multi-jours, défaut: 1)",
+    )
+    p.add_argument(
+        "--day-hours", type=float, default=7,
+        help="Budget d'une journée en heures, trajets + visites (défaut: 7)",
+    )
+    p.add_argument(
+        "--profiles", type=str, default="driving,foot",
+        help="Profils OSRM des matrices précalculées en phase 9, écrites dans output/matrices (défaut: driving,foot)",
+    )
     return p.parse_args()
 
 
@@ -48,9 +84,9 @@ def main() -> None:
         phases = {int(p.strip()) for p in args.phases.split(",")}
 
     # Auto-inclure les prérequis
-    if phases & {4, 5, 6, 7, 8}:
+    if phases & {4, 5, 6, 7, 8, 9}:
         phases |= {1, 2, 3}
-    if phases & {6, 7, 8}:
+    if phases & {6, 7, 8, 9}:
         phases |= {4}
     if phases & {7, 8}:
         phases |= {6}
@@ -144,7 +180,8 @@ def main() -> None:
             print_geocode_stats,
         )
 
-        df_sites = geocode_sites(df_sites)
+        bulk = {"auto": None, "bulk": True, "single": False}[args.geocode_mode]
+        df_sites = geocode_sites(df_sites, bulk=bulk, export=True)
         print_geocode_stats(df_sites)
 
         geo_path = export_geocoded(df_sites, args.output)
@@ -169,8 +206,9 @@ def main() -> None:
     # ─────────────────────────────────────────────────────────────────
     df_routable = None
     coords = []
+    clustered = False
 
-    if phases & {6, 7, 8}:
+    if phases & {6, 7, 8, 9}:
         df_routable = df_sites[
             df_sites["status"].isin(["OK", "WARNING"])
             & df_sites["latitude"].notna()
@@ -185,26 +223,36 @@ def main() -> None:
 
         if n_route < 2:
             print("  [stop] Pas assez de sites pour calculer un itinéraire.")
-            phases -= {6, 7, 8}
-        elif n_route > 500:
+            phases -= {6, 7, 8, 9}
+        elif args.prize and phases & {6, 7, 8}:
+            from pipeline.cluster import CLUSTER_THRESHOLD, prize_candidates
+
+            keep = prize_candidates(coords, df_routable["nb_orthos"], max_sites=CLUSTER_THRESHOLD)
+            if len(keep) < n_route:
+                df_routable = df_routable.iloc[keep].reset_index(drop=True)
+                coords = [coords[i] for i in keep]
+                print(f"  [info] Orienteering : {n_route} → {len(keep)} sites candidats.")
+        elif n_route > 500 and phases & {6, 7, 8}:
+            clustered = True
             print(
-                f"  [warn] {n_route} sites → la matrice OSRM sera longue. "
-                f"Utilisez --city ou --dept pour réduire."
+                f"  [info] {n_route} sites → planification par clusters "
+                f"(pas de matrice OSRM complète)."
             )
 
     # ─────────────────────────────────────────────────────────────────
     #  PHASE 6 — Matrice de distances OSRM
     # ─────────────────────────────────────────────────────────────────
     matrix = None
+    segments = None
 
-    if 6 in phases:
+    if 6 in phases and not clustered:
         print("\n" + "=" * 60)
         print("  PHASE 6 — Matrice de durées OSRM")
         print("=" * 60)
 
         from pipeline.routing import compute_duration_matrix
 
-        matrix = compute_duration_matrix(coords)
+        matrix = compute_duration_matrix(coords, symmetric=args.symmetric)
         print(f"  Matrice {matrix.shape[0]}×{matrix.shape[1]} calculée")
 
     # ─────────────────────────────────────────────────────────────────
@@ -212,6 +260,7 @@ def main() -> None:
     # ─────────────────────────────────────────────────────────────────
     route_order: list[int] = []
     total_duration = 0.0
+    days = None
 
     if 7 in phases:
         print("\n" + "=" * 60)
@@ -219,10 +268,14 @@ def main() -> None:
         print("=" * 60)
 
         from pipeline.routing import (
+            build_multi_day_solution,
             build_route_solution,
             export_route,
+            plan_multi_day,
             print_route_stats,
+            service_times,
             solve_tsp,
+            solve_tsp_parallel,
         )
 
         open_path = not args.closed_loop
@@ -230,13 +283,59 @@ def main() -> None:
         print(f"  Mode : {mode}")
         print(f"  Temps max solveur : {args.tsp_limit}s")
 
-        route_order, total_duration = solve_tsp(
-            matrix,
-            open_path=open_path,
-            time_limit=args.tsp_limit,
-        )
+        if args.days > 1 and clustered:
+            print("  [warn] Multi-jours indisponible en planification par clusters, tournée unique.")
+
+        if clustered:
+            from pipeline.cluster import plan_clustered
+
+            route_order, total_duration, segments = plan_clustered(
+                coords,
+                open_path=open_path,
+                time_limit=args.tsp_limit,
+                engine=args.tsp_engine,
+                symmetric=args.symmetric,
+            )
+        elif args.days > 1 or args.prize:
+            days, dropped = plan_multi_day(
+                matrix,
+                args.days,
+                day_budget_s=int(args.day_hours * 3600),
+                service_s=service_times(df_routable["nb_orthos"]),
+                open_path=open_path,
+                time_limit=args.tsp_limit,
+                prizes=df_routable["nb_orthos"] if args.prize else None,
+            )
+            route_order = [i for d in days for i in d["route"]]
+            total_duration = float(sum(d["travel_s"] for d in days))
+        elif args.tsp_workers > 1 and args.tsp_engine == "ortools":
+            print(f"  TSP multi-départ : {args.tsp_workers} processus")
+            route_order, total_duration = solve_tsp_parallel(
+                matrix,
+                open_path=open_path,
+                time_limit=args.tsp_limit,
+                workers=args.tsp_workers,
+            )
+        else:
+            route_order, total_duration = solve_tsp(
+                matrix,
+                open_path=open_path,
+                time_limit=args.tsp_limit,
+                engine=args.tsp_engine,
+            )
 
-        df_route = build_route_solution(df_routable, route_order, matrix)
+        if days is not None:
+            df_route = build_multi_day_solution(df_routable, days)
+            for k, d in enumerate(days):
+                print(
+                    f"  Jour {k + 1} : {len(d['route'])} sites, "
+                    f"{d['duration_s'] / 3600:.1f} h (trajets {d['travel_s'] / 60:.0f} min)"
+                    + (f", {d['prize']} orthophonistes" if args.prize else "")
+                )
+            if dropped:
+                print(f"  [warn] {len(dropped)} site(s) hors budget, non planifiés")
+        else:
+            df_route = build_route_solution(df_routable, route_order, matrix, segments=segments)
         print_route_stats(df_route, total_duration)
 
         route_path = export_route(df_route, args.output)
@@ -250,6 +349,7 @@ def main() -> None:
         print("  PHASE 8 — Carte de l'itinéraire")
         print("=" * 60)
 
+        from pipeline.geometry import format_report, simplify_geometry
         from pipeline.mapping import create_route_map, save_map as save_m
         from pipeline.routing import fetch_route_geometry
 
@@ -257,7 +357,15 @@ def main() -> None:
         route_geom = None
         if len(route_order) <= 300:
             print("  Récupération géométrie routière OSRM…")
-            route_geom = fetch_route_geometry(coords, route_order)
+            if days is not None:
+                route_geom = []
+                for d in days:
+                    if len(d["route"]) > 1:
+                        route_geom += fetch_route_geometry(coords, d["route"])
+            else:
+                route_geom = fetch_route_geometry(coords, route_order)
+            route_geom, report = simplify_geometry(route_geom)
+            print(f"  Simplification du tracé : {format_report(report)}")
         else:
             print("  Trop de sites pour la géométrie OSRM, lignes droites utilisées.")
 
@@ -265,6 +373,21 @@ def main() -> None:
         map_path = save_m(m, "map_route.html", args.output)
         print(f"  → {map_path}")
 
+    # ─────────────────────────────────────────────────────────────────
+    #  PHASE 9 — Matrices précalculées par code postal (batch nocturne)
+    # ─────────────────────────────────────────────────────────────────
+    if 9 in phases:
+        print("\n" + "=" * 60)
+        print("  PHASE 9 — Matrices de durées par code postal")
+        print("=" * 60)
+
+        from pipeline.matrix_store import build_zone_matrices
+
+        # Toujours dans MATRIX_DIR (ignore --output) : c'est là que le serveur les lit
+        for profile in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+            paths = build_zone_matrices(df_routable, profile=profile)
+            print(f"  {profile} : {len(paths)} matrices écrites")
+
     # ─────────────────────────────────────────────────────────────────
     elapsed = time.time() - t0
     print(f"\n{'=' * 60}")
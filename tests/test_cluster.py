@@ -0,0 +1,46 @@
+"""
+Planification par clusters : le point de départ n'est jamais un arrêt,
+y compris quand son cluster (ou l'ordre des clusters) ne compte que deux
+sites — cas court-circuité par solve_tsp.
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from pipeline import cluster, routing
+
+
+def _euclidean_matrix(coords, **kwargs):
+    pts = np.asarray(coords) * (111.32, 111.32 * math.cos(math.radians(49)))
+    km = np.sqrt(((pts[:, None] - pts[None]) ** 2).sum(axis=-1))
+    return (km * 100).astype(routing.DURATION_DTYPE)
+
+
+@pytest.mark.parametrize("open_path", [True, False])
+def test_two_site_problem_excludes_start(open_path):
+    matrix = np.array([[0, 7], [9, 0]], dtype=routing.DURATION_DTYPE)
+
+    route, total = routing.solve_tsp(matrix, open_path=open_path, start_index=1)
+
+    assert route == [0]
+    assert total == (9 if open_path else 16)
+
+
+@pytest.mark.parametrize("cluster_size", [21, 20])   # 2 puis 3 clusters
+def test_two_site_start_cluster(monkeypatch, cluster_size):
+    monkeypatch.setattr(cluster, "compute_duration_matrix", _euclidean_matrix)
+    # Départ isolé (≈ 80 km) avec un seul voisin, puis 40 sites groupés
+    coords = [(49.5, 3.0), (49.5001, 3.0001)]
+    coords += [(48.85 + 0.002 * (i // 8), 2.35 + 0.002 * (i % 8)) for i in range(40)]
+
+    route, total, segments = cluster.plan_clustered(
+        coords, start_index=0, engine="numpy", cluster_size=cluster_size,
+    )
+
+    assert sorted(route) == list(range(1, len(coords)))
+    assert route[0] == 1
+    assert len(segments) == len(route)
+    assert segments[0] == _euclidean_matrix(coords[:2])[0, 1]
+    assert math.isclose(total, sum(segments))
@@ -0,0 +1,181 @@
+"""
+Géocodage groupé (/search/csv) contre un serveur local qui imite l'API
+BAN / IGN : découpage en lots, rattachement des résultats aux sites,
+fallback unitaire des lignes non trouvées.
+"""
+
+import csv
+import io
+import json
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+import pipeline.geocode as geocode
+
+
+class _StubGeocoder(BaseHTTPRequestHandler):
+    """
+    POST /search/csv : renvoie le CSV reçu enrichi (latitude, longitude,
+    result_*) en ordre inverse ; les adresses contenant « INCONNU » restent
+    sans résultat.
+    GET /search : résultat unique (score 0.8) pour le fallback unitaire.
+    """
+
+    protocol_version = "HTTP/1.1"
+    uploads: list[dict] = []
+    queries: list[dict] = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers["Content-Length"]))
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw
+        )
+        fields: dict[str, list[str]] = {}
+        data = ""
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "data":
+                data = part.get_payload(decode=True).decode("utf-8")
+            else:
+                fields.setdefault(name, []).append(part.get_content().strip())
+
+        rows = list(csv.DictReader(io.StringIO(data)))
+        type(self).uploads.append({"fields": fields, "rows": rows})
+
+        out = io.StringIO()
+        names = list(rows[0]) + ["latitude", "longitude", "result_label", "result_score"]
+        writer = csv.DictWriter(out, fieldnames=names)
+        writer.writeheader()
+        for row in reversed(rows):
+            number = int(row["address_line_clean"].split()[0])
+            if "INCONNU" in row["address_line_clean"]:
+                row.update(latitude="", longitude="", result_label="", result_score="")
+            else:
+                row.update(
+                    latitude=f"{48.8 + number / 1000:.6f}",
+                    longitude="2.35",
+                    result_label=f"{row['address_line_clean']} {row['postal_code_clean']} {row['city_clean']}",
+                    result_score="0.93",
+                )
+            writer.writerow(row)
+        self._send(out.getvalue().encode("utf-8"), "text/csv")
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        type(self).queries.append(params)
+        feature = {
+            "properties": {"label": f"fallback {params['q']}", "score": 0.8},
+            "geometry": {"coordinates": [2.30, 48.70]},
+        }
+        self._send(json.dumps({"features": [feature]}).encode("utf-8"), "application/json")
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    _StubGeocoder.uploads = []
+    _StubGeocoder.queries = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGeocoder)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/search"
+    monkeypatch.setattr(geocode, "GEOCODE_URL", base)
+    monkeypatch.setattr(geocode, "GEOCODE_CSV_URL", base + "/csv")
+    monkeypatch.setattr(geocode, "GEOCODE_BULK_CHUNK", 3)
+    yield _StubGeocoder
+    server.shutdown()
+    server.server_close()
+
+
+def _sites(addresses: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({
+        "address_key": [f"key{i}" for i in range(len(addresses))],
+        "address_line_clean": addresses,
+        "postal_code_clean": "75011",
+        "city_clean": "PARIS",
+        "address_normalized": [f"{a} 75011 PARIS" for a in addresses],
+    })
+
+
+def test_bulk_chunks_and_maps_results_back(stub, tmp_path):
+    df = _sites([f"{i} RUE OBERKAMPF" for i in range(1, 8)])
+
+    out = geocode.geocode_sites(df, cache_dir=tmp_path, bulk=True)
+
+    # 7 sites, lots de 3 → 3 envois
+    assert [len(u["rows"]) for u in stub.uploads] == [3, 3, 1]
+    assert stub.uploads[0]["fields"] == {
+        "columns": ["address_line_clean", "city_clean"],
+        "postcode": ["postal_code_clean"],
+    }
+    assert stub.queries == []
+
+    # Réponse renvoyée en ordre inverse : rattachement par row_id
+    assert out["geocoded_label"].tolist() == [f"{i} RUE OBERKAMPF 75011 PARIS" for i in range(1, 8)]
+    assert out["latitude"].tolist() == pytest.approx([48.8 + i / 1000 for i in range(1, 8)])
+    assert (out["status"] == "OK").all()
+
+
+def test_unmatched_rows_fall_back_to_single_queries(stub, tmp_path):
+    df = _sites(["1 RUE OBERKAMPF", "2 IMPASSE INCONNU", "3 RUE OBERKAMPF", "4 INCONNU"])
+
+    out = geocode.geocode_sites(df, cache_dir=tmp_path, bulk=True)
+
+    # Seules les deux lignes sans résultat repassent en unitaire (niveau 2)
+    assert sorted(q["q"] for q in stub.queries) == [
+        "2 IMPASSE INCONNU 75011 PARIS",
+        "4 INCONNU 75011 PARIS",
+    ]
+    labels = out.set_index("address_key")["geocoded_label"]
+    assert labels["key0"] == "1 RUE OBERKAMPF 75011 PARIS"
+    assert labels["key1"] == "fallback 2 IMPASSE INCONNU 75011 PARIS"
+    assert labels["key3"] == "fallback 4 INCONNU 75011 PARIS"
+    assert out.set_index("address_key").loc["key1", "status"] == "OK"
+
+
+def test_second_run_is_served_from_cache(stub, tmp_path):
+    df = _sites(["1 RUE OBERKAMPF", "2 INCONNU", "3 RUE OBERKAMPF"])
+    first = geocode.geocode_sites(df, cache_dir=tmp_path, bulk=True)
+    uploads, queries = len(stub.uploads), len(stub.queries)
+
+    second = geocode.geocode_sites(df, cache_dir=tmp_path, bulk=True)
+
+    assert (len(stub.uploads), len(stub.queries)) == (uploads, queries)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_new_geocodes_are_exported_to_versioned_json(stub, tmp_path, capsys):
+    df = _sites(["1 RUE OBERKAMPF", "2 INCONNU"])
+    geocode.geocode_sites(df, cache_dir=tmp_path, bulk=True, export=True)
+
+    text = (tmp_path / "geocode_cache.json").read_text(encoding="utf-8")
+    assert len(text.splitlines()) > len(df)  # indenté : diffs git par entrée
+    exported = json.loads(text)
+    assert sorted(exported) == ["key0", "key1"]
+    assert exported["key1"]["geocoded_label"] == "fallback 2 INCONNU 75011 PARIS"
+
+    # Le fichier exporté n'est pas ré-importé au démarrage suivant
+    capsys.readouterr()
+    geocode.geocode_sites(df, cache_dir=tmp_path, bulk=True)
+    assert "importées" not in capsys.readouterr().out
+
+
+def test_versioned_json_is_not_written_by_default(stub, tmp_path):
+    df = _sites(["1 RUE OBERKAMPF"])
+    geocode.geocode_sites(df, cache_dir=tmp_path, bulk=True)
+
+    assert not (tmp_path / "geocode_cache.json").exists()
@@ -0,0 +1,21 @@
+"""
+Arrêt anticipé du TSP OR-Tools : la solution retournée n'est jamais moins
+bonne que celle de l'heuristique NumPy (plancher).
+"""
+
+import numpy as np
+
+from pipeline import routing
+
+
+def test_early_stop_never_worse_than_numpy_heuristic():
+    # Instance où GLS stagnait au-dessus du 2-opt + Or-opt (52098 vs 51058)
+    rng = np.random.default_rng(2)
+    pts = rng.random((40, 2)) * 10_000
+    matrix = np.sqrt(((pts[:, None] - pts[None]) ** 2).sum(axis=-1)).astype(np.int64)
+
+    route, total = routing.solve_tsp(matrix, open_path=False)
+    _, heuristic_total = routing._solve_numpy(matrix, 0)
+
+    assert sorted(route + [0]) == list(range(40))
+    assert total <= heuristic_total